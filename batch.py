@@ -0,0 +1,321 @@
+"""
+Batch runner of ``roundabout_simplification`` over many cities.
+
+A manifest lists the inputs, one per line: Overpass responses (``.json``, e.g. the
+ones in ``cache/``), GeoPackages or GeoParquet files. Every city is simplified as a
+whole in a pool of worker processes sized by the estimated memory of the largest
+job, and written atomically to ``output_dir`` (written to a temporary file, then
+moved in place).
+
+Finished cities are appended to a checkpoint file (JSON lines) as soon as they are
+written, with the parameters and format they were run with, so an interrupted or
+crashed batch resumes without redoing them::
+
+    python batch.py manifest.txt out/ --checkpoint out/checkpoint.jsonl
+
+At the end, throughput is reported in cities per hour and edges per second.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import geopandas as gpd
+
+from overpass_loader import load_overpass_edges
+from rabs_simplify import roundabout_simplification, set_polygonize_cache
+from writers import stringify_lists
+
+# rough peak memory of a job relative to the size of its input file
+MEMORY_FACTOR = 20
+
+
+def read_manifest(path):
+    """Input paths listed in ``path``, one per line. Blank lines and # are skipped."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+
+    return [
+        os.path.normpath(os.path.join(base, line))
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def _load(path):
+    """Edges of ``path``, or None if it is not an Overpass response nor a dataset."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path) as f:
+            # Nominatim responses stored next to the Overpass ones are lists
+            if f.read(1) != "{":
+                return None
+        return load_overpass_edges(path)
+    if ext in (".parquet", ".geoparquet"):
+        return gpd.read_parquet(path)
+
+    return gpd.read_file(path)
+
+
+def _write_atomic(gdf, path):
+    """
+    Writes ``gdf`` to a temporary file next to ``path`` and moves it in place. A
+    GeoPackage layer is named after ``path``.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    name, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=f".tmp{ext}")
+    os.close(fd)
+    try:
+        if ext == ".parquet":
+            gdf.to_parquet(tmp)
+        else:
+            # the empty file made by mkstemp is not a GeoPackage
+            os.remove(tmp)
+            stringify_lists(gdf).to_file(tmp, driver="GPKG", layer=name)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _output_path(path, output_dir, fmt):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, f"{name}.{fmt}")
+
+
+def _init_worker():
+    # every job is a different city, cached polygons would only pin memory outside
+    # of the MEMORY_FACTOR estimate
+    set_polygonize_cache(0)
+
+
+def _run_job(args):
+    """Simplifies one city. Runs in a worker process."""
+    path, output, params = args
+    start = time.perf_counter()
+    edges = _load(path)
+    if edges is None:
+        return {"input": path, "skipped": True}
+    n_edges = len(edges)
+    _write_atomic(roundabout_simplification(edges, **params), output)
+
+    return {
+        "input": path,
+        "output": output,
+        "edges": n_edges,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _read_checkpoint(path):
+    """
+    Records of the jobs finished by previous runs, keyed by input path. The last
+    record of an input wins.
+    """
+    done = {}
+    if path is None or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # last line of a crashed run
+                continue
+            done[record["input"]] = record
+
+    return done
+
+
+def _append_checkpoint(path, record):
+    if path is None:
+        return
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _is_done(record, output, params, fmt):
+    """
+    Whether the checkpoint ``record`` of an input is a job run with the same
+    ``params`` and ``fmt``, either skipped or written to the current ``output``,
+    which still exists.
+    """
+    if record is None:
+        return False
+    # compared as JSON, as read back from the checkpoint
+    if record.get("params") != json.loads(json.dumps(params)):
+        return False
+    if record.get("fmt") != fmt:
+        return False
+
+    if record.get("skipped", False):
+        return True
+    # a rerun into another output directory writes every city again
+    return record.get("output") == output and os.path.exists(output)
+
+
+def _available_memory():
+    """Available physical memory in bytes, None if it cannot be determined."""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _n_workers(paths, max_workers=None, memory_budget=None):
+    """
+    Number of workers such that the largest jobs running together fit in
+    ``memory_budget`` (default: available memory), capped by ``max_workers``
+    (default: number of CPUs).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if memory_budget is None:
+        memory_budget = _available_memory()
+    if memory_budget is None or not paths:
+        return max_workers
+    largest = max(os.path.getsize(p) for p in paths) * MEMORY_FACTOR
+
+    return max(1, min(max_workers, int(memory_budget // max(largest, 1))))
+
+
+def run_batch(
+    paths,
+    output_dir,
+    checkpoint=None,
+    fmt="gpkg",
+    max_workers=None,
+    memory_budget=None,
+    **params,
+):
+    """
+    Simplifies every input of ``paths`` and writes it to ``output_dir``.
+
+    Parameters
+    ----------
+    paths : list of str
+        Overpass responses (``.json``), GeoPackages or GeoParquet files
+    output_dir : str
+        directory of the results, one ``<input name>.<fmt>`` per input
+    checkpoint : str (default None)
+        JSON lines file recording finished inputs, with their parameters and
+        format. Inputs recorded with the same ``params`` and ``fmt`` are skipped if
+        their output exists, or if they were skipped as not a network.
+    fmt : str (default 'gpkg')
+        output format, 'gpkg' or 'parquet'
+    max_workers : int (default None)
+        maximum number of worker processes, defaults to the number of CPUs
+    memory_budget : int (default None)
+        memory in bytes available to the workers, defaults to the available
+        physical memory. Each job is estimated at ``MEMORY_FACTOR`` times the size
+        of its input.
+    **params
+        passed to ``roundabout_simplification``
+
+    Returns
+    -------
+    dict
+        number of cities done, skipped (already in the checkpoint or not a
+        network), failed (with their errors), edges processed, wall time and
+        throughput
+    """
+    if fmt not in ("gpkg", "parquet"):
+        raise ValueError(
+            f"Unsupported output format '{fmt}'. Use 'gpkg' or 'parquet'."
+        )
+    os.makedirs(output_dir, exist_ok=True)
+    done = _read_checkpoint(checkpoint)
+
+    jobs = []
+    skipped = 0
+    for path in paths:
+        output = _output_path(path, output_dir, fmt)
+        if _is_done(done.get(path), output, params, fmt):
+            skipped += 1
+            continue
+        jobs.append((path, output, params))
+    # largest cities first so the pool does not end on a single long job
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    n_workers = _n_workers([job[0] for job in jobs], max_workers, memory_budget)
+    start = time.perf_counter()
+    finished, failed = [], {}
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker
+    ) as executor:
+        futures = {executor.submit(_run_job, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                failed[futures[future]] = repr(e)
+                continue
+            record.update(params=params, fmt=fmt)
+            _append_checkpoint(checkpoint, record)
+            if record.get("skipped"):
+                skipped += 1
+                continue
+            finished.append(record)
+    elapsed = time.perf_counter() - start
+
+    edges = sum(r["edges"] for r in finished)
+    return {
+        "done": len(finished),
+        "skipped": skipped,
+        "failed": failed,
+        "workers": n_workers,
+        "edges": edges,
+        "seconds": elapsed,
+        "cities_per_hour": len(finished) / elapsed * 3600 if elapsed else 0.0,
+        "edges_per_second": edges / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("manifest", help="file listing the inputs, one per line")
+    parser.add_argument("output_dir")
+    parser.add_argument("--checkpoint", metavar="PATH")
+    parser.add_argument("--format", choices=["gpkg", "parquet"], default="gpkg")
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument("--memory-budget", type=int, help="bytes")
+    args = parser.parse_args(argv)
+
+    report = run_batch(
+        read_manifest(args.manifest),
+        args.output_dir,
+        checkpoint=args.checkpoint,
+        fmt=args.format,
+        max_workers=args.max_workers,
+        memory_budget=args.memory_budget,
+    )
+    print(
+        f"{report['done']} cities done, {report['skipped']} skipped, "
+        f"{len(report['failed'])} failed with {report['workers']} workers "
+        f"in {report['seconds']:.1f} s"
+    )
+    print(
+        f"{report['cities_per_hour']:.1f} cities/h, "
+        f"{report['edges_per_second']:.0f} edges/s"
+    )
+    for path, error in report["failed"].items():
+        print(f"failed: {path}: {error}")
+
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
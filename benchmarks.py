@@ -0,0 +1,262 @@
+"""
+Benchmark suite for the stages of ``roundabout_simplification``.
+
+Every Overpass response in ``cache/`` is turned into an edges GeoDataFrame with
+``overpass_loader`` (simplified, projected and undirected, as ``data_fetching.ipynb``)
+and each stage is timed on its own. Nominatim responses stored in the same folder are
+skipped.
+
+For every network and stage the suite reports the best wall time over ``repeat``
+runs and the peak memory of one extra run traced with ``tracemalloc`` (memory
+allocated by GEOS itself is not traced). Scaling is reported as the exponent of a
+power law fitted between number of edges and wall time across networks.
+
+Results can be stored as a baseline and later runs compared against it::
+
+    python benchmarks.py --save-baseline baseline.json
+    python benchmarks.py --compare baseline.json --tolerance 0.25
+
+A comparison exits with status 1 when any stage is slower (or uses more memory)
+than the baseline by more than ``tolerance``.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import rabs_simplify as rs
+from overpass_loader import load_overpass_edges
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+
+def load_edges(path):
+    """
+    Edges GeoDataFrame from a cached Overpass response, or None if ``path`` is not
+    an Overpass response (Nominatim responses are JSON lists).
+    """
+    with open(path) as f:
+        if f.read(1) != "{":
+            return None
+
+    return load_overpass_edges(path)
+
+
+def _measure(func, repeat=3, setup=None):
+    """
+    Runs ``func`` ``repeat`` times and once more under ``tracemalloc``. ``setup`` is
+    called before every run (outside the timing). Returns the result of the last run,
+    the best wall time in seconds and the peak traced memory in bytes.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, best, peak
+
+
+def _clear_polygonize_cache():
+    rs._POLYGONIZE_CACHE.clear()
+
+
+def _capture_coins_input(edges, rab_multipolygons):
+    """
+    Runs ``_selecting_incoming_lines`` once and returns the grouped incoming lines it
+    passes to ``_coins_filtering_many_incoming``.
+    """
+    captured = []
+    coins = rs._coins_filtering_many_incoming
+
+    def capture(incoming_many, **kwargs):
+        captured.append(incoming_many)
+        return coins(incoming_many, **kwargs)
+
+    rs._coins_filtering_many_incoming = capture
+    try:
+        rs._selecting_incoming_lines(rab_multipolygons, edges)
+    finally:
+        rs._coins_filtering_many_incoming = coins
+
+    return captured[0]
+
+
+def benchmark_network(edges, repeat=3):
+    """
+    Times every stage on ``edges``. Stages are run without a shared
+    ``SpatialIndexContext`` so each one builds what it needs, as when called on its
+    own. Stages following the roundabout selection are skipped on networks without
+    roundabouts. Returns a list of records.
+    """
+    records = []
+
+    def run(stage, func, setup=None):
+        result, seconds, peak = _measure(func, repeat=repeat, setup=setup)
+        records.append({"stage": stage, "seconds": seconds, "peak_bytes": peak})
+        return result
+
+    polys = run(
+        "polygonize",
+        lambda: rs._polygonize_ifnone(edges, None),
+        setup=_clear_polygonize_cache,
+    )
+    rab = run(
+        "selecting_rabs_adjacent",
+        lambda: rs._selecting_rabs_from_poly(polys, include_adjacent=True),
+    )
+    run(
+        "selecting_rabs_single",
+        lambda: rs._selecting_rabs_from_poly(polys, include_adjacent=False),
+    )
+    counts = {"n_edges": len(edges), "n_polys": len(polys), "n_rabs": 0}
+    if not rab.empty:
+        counts.update(_benchmark_rab_stages(edges, rab, run))
+    for record in records:
+        record.update(counts)
+
+    return records
+
+
+def _benchmark_rab_stages(edges, rab, run):
+    """Times the stages following the roundabout selection. Returns cardinalities."""
+    rab_multipolygons = run(
+        "center_points_centroid",
+        lambda: rs._rabs_center_points(rab, center_type="centroid"),
+    )
+    run("center_points_mean", lambda: rs._rabs_center_points(rab, center_type="mean"))
+    run("center_points_mbc", lambda: rs._rabs_center_points(rab, center_type="mbc"))
+    incoming_all, idx_drop = run(
+        "selecting_incoming_lines",
+        lambda: rs._selecting_incoming_lines(rab_multipolygons, edges),
+    )
+    incoming_many = _capture_coins_input(edges, rab_multipolygons)
+    run("coins_filtering", lambda: rs._coins_filtering_many_incoming(incoming_many))
+    run(
+        "ext_lines_to_center",
+        lambda: rs._ext_lines_to_center(edges, incoming_all, idx_drop),
+    )
+
+    return {
+        "n_rabs": rab.index_right.nunique(),
+        "n_incoming": len(incoming_all),
+        "n_grouped": len(incoming_many),
+    }
+
+
+def run_suite(paths, repeat=3):
+    """Benchmarks every network in ``paths``. Returns a DataFrame of records."""
+    records = []
+    for path in paths:
+        edges = load_edges(path)
+        if edges is None:
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        for record in benchmark_network(edges, repeat=repeat):
+            record["network"] = name
+            records.append(record)
+
+    return pd.DataFrame(records)
+
+
+def scaling(results):
+    """
+    Exponent ``k`` of ``seconds ~ n_edges ** k`` fitted per stage across networks.
+    Stages timed on fewer than two networks are reported as NaN.
+    """
+
+    def exponent(group):
+        group = group[group.seconds > 0]
+        if group.n_edges.nunique() < 2:
+            return np.nan
+        return np.polyfit(np.log(group.n_edges), np.log(group.seconds), 1)[0]
+
+    return results.groupby("stage").apply(exponent).rename("exponent")
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compares ``results`` with ``baseline`` (both DataFrames of records) per network
+    and stage. Returns the joined table with a ``regression`` column, True where
+    wall time or peak memory exceed the baseline by more than ``tolerance``.
+    """
+    joined = results.merge(
+        baseline[["network", "stage", "seconds", "peak_bytes"]],
+        on=["network", "stage"],
+        suffixes=("", "_baseline"),
+    )
+    joined["time_ratio"] = joined.seconds / joined.seconds_baseline
+    joined["memory_ratio"] = joined.peak_bytes / joined.peak_bytes_baseline.replace(
+        0, np.nan
+    )
+    joined["regression"] = (joined.time_ratio > 1 + tolerance) | (
+        joined.memory_ratio > 1 + tolerance
+    )
+
+    return joined
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "paths", nargs="*", help="Overpass responses (default: every file in cache/)"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(
+        glob.glob(os.path.join(CACHE_DIR, "*.json")), key=os.path.getsize
+    )
+    results = run_suite(paths, repeat=args.repeat)
+
+    table = results.pivot(index="network", columns="stage", values="seconds")
+    table.insert(0, "n_edges", results.groupby("network").n_edges.first())
+    print("Wall time [s]")
+    print(table.sort_values("n_edges").to_string(float_format="{:.4f}".format))
+    print("\nPeak traced memory [MiB]")
+    memory = results.pivot(index="network", columns="stage", values="peak_bytes")
+    print((memory / 2**20).to_string(float_format="{:.2f}".format))
+    print("\nScaling exponent (seconds ~ n_edges ** k)")
+    print(scaling(results).to_string(float_format="{:.2f}".format))
+
+    if args.save_baseline:
+        results.to_json(args.save_baseline, orient="records", indent=1)
+
+    if args.compare:
+        baseline = pd.read_json(args.compare, orient="records")
+        joined = compare(results, baseline, tolerance=args.tolerance)
+        regressions = joined[joined.regression]
+        if not regressions.empty:
+            print(f"\nRegressions above {args.tolerance:.0%}")
+            print(
+                regressions[
+                    ["network", "stage", "seconds", "time_ratio", "memory_ratio"]
+                ].to_string(index=False, float_format="{:.3f}".format)
+            )
+            return 1
+        print(f"\nNo regressions above {args.tolerance:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""
+Columnar layout of simplified edges for sharing them between processes.
+
+Pickling a GeoDataFrame for every worker serializes each shapely geometry and gives
+every worker its own copy. ``ColumnarEdges`` stores the network as contiguous
+buffers instead:
+
+- ``coords``: the vertices of all the LineStrings, (n_vertices, 2) float64
+- ``offsets``: position of the first vertex of each LineString in ``coords``, plus
+  the total, int64
+- per attribute and index level, buffers depending on its dtype (see ``_encode``):
+  the values of numeric columns, values and a ``valid`` mask of nullable ones,
+  codes and categories of categorical ones, and utf-8 ``data`` with ``offsets`` and
+  a ``valid`` mask of string and other object columns
+
+Dtypes are kept through the round trip; columns that cannot be stored without
+loss are rejected. The buffers are laid out, aligned, in a single block of shared
+memory or file, so workers map them as read-only numpy arrays without deserializing
+or copying. Only coordinates, offsets and numeric columns are used in place:
+geometries are rebuilt from them and other columns are decoded into a copy on first
+access::
+
+    result = roundabout_simplification(edges, columnar=True)
+    shm, meta = result.to_shared_memory()
+    # in each worker, with (shm.name, meta) as argument
+    edges = ColumnarEdges.from_shared_memory(name, meta)
+
+The process creating the shared memory owns it and should ``close`` and ``unlink``
+it once workers are done. ``to_file`` and ``from_file`` do the same with a
+memory-mapped file.
+"""
+import json
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pygeos
+
+_MAGIC = b"RABCOL02"
+_ALIGNMENT = 64
+
+
+def _align(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _is_json(value):
+    """Whether ``value`` comes back unchanged from a JSON round trip."""
+    if type(value) in (str, bool, int, float):
+        return True
+    if type(value) is list:
+        return all(map(_is_json, value))
+    if type(value) is dict:
+        return all(type(k) is str and _is_json(v) for k, v in value.items())
+    return False
+
+
+def _to_python(value):
+    """``value`` with its numpy scalars, also inside lists and dicts, as Python ones."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if type(value) is list:
+        return [_to_python(v) for v in value]
+    if type(value) is dict:
+        return {_to_python(k): _to_python(v) for k, v in value.items()}
+    return value
+
+
+def _encode_strings(name, values, to_str):
+    """utf-8 ``data``, ``offsets`` and ``valid`` buffers of ``values``."""
+    valid = ~np.asarray(pd.isna(values), dtype=bool)
+    encoded = [
+        to_str(v).encode() if ok else b""
+        for v, ok in zip(np.asarray(values, dtype=object), valid)
+    ]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(
+        np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)),
+        out=offsets[1:],
+    )
+    return {
+        f"{name}/data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        f"{name}/offsets": offsets,
+        f"{name}/valid": valid,
+    }
+
+
+def _encode(name, values):
+    """
+    Buffers of a column (Series or Index) and the encoding to decode them with the
+    same dtype:
+
+    - ``numpy``: numeric and datetime values, stored as they are
+    - ``masked``: nullable integers, floats and booleans, values and ``valid`` mask
+    - ``categorical``: ``codes`` and the categories, encoded as a column
+    - ``string``: strings (object or ``string`` dtype) as utf-8
+    - ``json``: other objects made of strings, numbers, booleans, lists and dicts
+      (e.g. OSM ids merged into lists), as utf-8 JSON
+
+    Numpy scalars in object columns (e.g. ``np.int64`` ids) are stored as the
+    equivalent Python values, which they are decoded to.
+
+    Raises ValueError for columns that cannot be stored without loss.
+    """
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        return {name: np.ascontiguousarray(values)}, {"kind": "numpy"}
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        buffers, categories = _encode(f"{name}/categories", dtype.categories)
+        buffers[f"{name}/codes"] = np.ascontiguousarray(pd.Categorical(values).codes)
+        encoding = {
+            "kind": "categorical",
+            "ordered": bool(dtype.ordered),
+            "categories": categories,
+        }
+        return buffers, encoding
+
+    masked = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+    if isinstance(values.array, masked):
+        buffers = {
+            name: values.array.to_numpy(
+                dtype=dtype.numpy_dtype, na_value=dtype.numpy_dtype.type(0)
+            ),
+            f"{name}/valid": ~np.asarray(pd.isna(values), dtype=bool),
+        }
+        return buffers, {"kind": "masked", "dtype": str(dtype)}
+
+    if isinstance(dtype, pd.StringDtype):
+        return _encode_strings(name, values, str), {"kind": "string", "dtype": "string"}
+
+    if dtype == object:
+        values = pd.Series(
+            [_to_python(v) for v in values], dtype=object, name=values.name
+        )
+        items = np.asarray(values, dtype=object)[~np.asarray(pd.isna(values))]
+        if all(type(v) is str for v in items):
+            return _encode_strings(name, values, str), {"kind": "string"}
+        if all(map(_is_json, items)):
+            return _encode_strings(name, values, json.dumps), {"kind": "json"}
+
+    raise ValueError(
+        f"Column '{values.name}' of dtype {dtype} cannot be stored as columnar without "
+        "loss. Convert it to a numeric, nullable, categorical or string dtype."
+    )
+
+
+def _decode(buffers, name, encoding):
+    """
+    Values of a column: a view of the buffers for the ``numpy`` encoding, otherwise
+    a new array.
+    """
+    kind = encoding["kind"]
+    if kind == "numpy":
+        return buffers[name]
+
+    if kind == "masked":
+        array_type = pd.api.types.pandas_dtype(encoding["dtype"]).construct_array_type()
+        return array_type(buffers[name], ~buffers[f"{name}/valid"])
+
+    if kind == "categorical":
+        categories = _decode(buffers, f"{name}/categories", encoding["categories"])
+        return pd.Categorical.from_codes(
+            buffers[f"{name}/codes"],
+            categories=pd.Index(categories, dtype=categories.dtype),
+            ordered=encoding["ordered"],
+        )
+
+    raw = buffers[f"{name}/data"].tobytes()
+    offsets = buffers[f"{name}/offsets"]
+    parse = json.loads if kind == "json" else bytes.decode
+    # filled one by one, lists would otherwise become a second dimension
+    values = np.empty(len(offsets) - 1, dtype=object)
+    for i, (start, end, ok) in enumerate(
+        zip(offsets[:-1], offsets[1:], buffers[f"{name}/valid"])
+    ):
+        values[i] = parse(raw[start:end]) if ok else None
+    if "dtype" in encoding:
+        return pd.array(values, dtype=encoding["dtype"])
+    return values
+
+
+class ColumnarEdges:
+    """
+    LineStrings, attributes and index of an edges GeoDataFrame as contiguous numpy
+    buffers. Build it with ``from_geodataframe`` and share it with
+    ``to_shared_memory`` or ``to_file``. Instances mapped from shared memory or a
+    file have read-only buffers.
+
+    Parameters
+    ----------
+    buffers : dict
+        numpy arrays by buffer name
+    meta : dict
+        length, CRS (WKT), geometry column name, index and column names and the
+        encoding of each of them
+    owner : object (default None)
+        object holding the memory of ``buffers``, kept alive with them
+    """
+
+    def __init__(self, buffers, meta, owner=None):
+        self.buffers = buffers
+        self.meta = meta
+        self._owner = owner
+        self._decoded = {}
+
+    @classmethod
+    def from_geodataframe(cls, gdf):
+        """
+        Columnar copy of ``gdf``, whose geometries must all be LineStrings. Raises
+        ValueError if a column cannot be stored without loss (see ``_encode``).
+        """
+        geoms = gdf.geometry.values.data
+        if pygeos.is_missing(geoms).any() or (pygeos.get_type_id(geoms) != 1).any():
+            raise ValueError("Only LineString geometries can be stored as columnar.")
+        coords, idxs = pygeos.get_coordinates(geoms, return_index=True)
+        offsets = np.zeros(len(geoms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(idxs, minlength=len(geoms)), out=offsets[1:])
+
+        buffers = {"coords": coords, "offsets": offsets}
+        encodings = {}
+        columns = [c for c in gdf.columns if c != gdf.geometry.name]
+        named = [
+            (f"index/{i}", gdf.index.get_level_values(i))
+            for i in range(gdf.index.nlevels)
+        ] + [(f"column/{i}", gdf[column]) for i, column in enumerate(columns)]
+        for name, values in named:
+            column_buffers, encodings[name] = _encode(name, values)
+            buffers.update(column_buffers)
+
+        meta = {
+            "length": len(gdf),
+            "crs": None if gdf.crs is None else gdf.crs.to_wkt(),
+            "geometry": gdf.geometry.name,
+            "index": list(gdf.index.names),
+            "columns": columns,
+            "encodings": encodings,
+        }
+        return cls(buffers, meta)
+
+    def __len__(self):
+        return self.meta["length"]
+
+    @property
+    def coords(self):
+        return self.buffers["coords"]
+
+    @property
+    def offsets(self):
+        return self.buffers["offsets"]
+
+    def _values(self, name):
+        """Decoded buffers of ``name``, decoded once unless they are a view."""
+        if name not in self._decoded:
+            encoding = self.meta["encodings"][name]
+            values = _decode(self.buffers, name, encoding)
+            if encoding["kind"] == "numpy":
+                return values
+            self._decoded[name] = values
+        return self._decoded[name]
+
+    def column(self, name):
+        """
+        Values of the attribute ``name``, with its original dtype. Numeric columns
+        are read-only views of the buffers; other columns are decoded into a copy on
+        first access, kept for the following ones.
+        """
+        return self._values(f"column/{self.meta['columns'].index(name)}")
+
+    @property
+    def index(self):
+        levels = [self._values(f"index/{i}") for i in range(len(self.meta["index"]))]
+        if len(levels) == 1:
+            return pd.Index(
+                levels[0], dtype=levels[0].dtype, name=self.meta["index"][0]
+            )
+        return pd.MultiIndex.from_arrays(levels, names=self.meta["index"])
+
+    def geometry(self):
+        """pygeos LineStrings rebuilt from ``coords`` and ``offsets`` in bulk."""
+        counts = np.diff(self.offsets)
+        geoms = pygeos.from_wkt(np.full(len(self), "LINESTRING EMPTY", dtype=object))
+        filled = np.flatnonzero(counts)
+        if len(filled):
+            geoms[filled] = pygeos.linestrings(
+                self.coords, indices=np.repeat(np.arange(len(filled)), counts[filled])
+            )
+        return geoms
+
+    def to_geodataframe(self):
+        """GeoDataFrame of the edges (a copy, geometries are rebuilt)."""
+        data = {name: self.column(name) for name in self.meta["columns"]}
+        data[self.meta["geometry"]] = gpd.GeoSeries(
+            self.geometry(), crs=self.meta["crs"]
+        ).values
+        return gpd.GeoDataFrame(
+            data, index=self.index, geometry=self.meta["geometry"], crs=self.meta["crs"]
+        )
+
+    def _layout(self):
+        """Aligned offset, dtype and shape of every buffer, and the total size."""
+        layout, offset = {}, 0
+        for name, arr in self.buffers.items():
+            offset = _align(offset)
+            layout[name] = [arr.dtype.str, list(arr.shape), offset]
+            offset += arr.nbytes
+        return layout, offset
+
+    def _write_into(self, buf, layout):
+        for name, (dtype, shape, offset) in layout.items():
+            np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)[...] = (
+                self.buffers[name]
+            )
+
+    @classmethod
+    def _from_buffer(cls, buf, meta, base=0, owner=None):
+        buffers = {}
+        for name, (dtype, shape, offset) in meta["buffers"].items():
+            arr = np.ndarray(shape, dtype=dtype, buffer=buf, offset=base + offset)
+            arr.flags.writeable = False
+            buffers[name] = arr
+        meta = {k: v for k, v in meta.items() if k != "buffers"}
+        return cls(buffers, meta, owner=owner)
+
+    def to_shared_memory(self, name=None):
+        """
+        Copies the buffers into a new block of shared memory.
+
+        Returns
+        -------
+        tuple
+            the ``SharedMemory`` block, to close and unlink once workers are done,
+            and the metadata to pass to ``from_shared_memory`` with its name
+        """
+        layout, size = self._layout()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        self._write_into(shm.buf, layout)
+        return shm, {**self.meta, "buffers": layout}
+
+    @classmethod
+    def from_shared_memory(cls, name, meta):
+        """
+        Maps the edges written by ``to_shared_memory`` without copying them. The
+        block is not tracked by this process, which would otherwise unlink it on
+        exit while its owner and other workers still use it.
+        """
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            # attaching registers the block with the resource tracker (POSIX only)
+            if os.name == "posix":
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls._from_buffer(shm.buf, meta, owner=shm)
+
+    def to_file(self, path):
+        """Writes the metadata and the aligned buffers to ``path``."""
+        layout, size = self._layout()
+        header = json.dumps({**self.meta, "buffers": layout}).encode()
+        base = _align(len(_MAGIC) + 8 + len(header))
+        with open(path, "wb") as f:
+            f.write(_MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, (_, _, offset) in layout.items():
+                f.seek(base + offset)
+                np.ascontiguousarray(self.buffers[name]).tofile(f)
+            f.truncate(base + size)
+
+    @classmethod
+    def from_file(cls, path):
+        """Memory-maps the edges written by ``to_file`` without reading them."""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a columnar edges file.")
+            (n,) = struct.unpack("<Q", f.read(8))
+            meta = json.loads(f.read(n))
+        base = _align(len(_MAGIC) + 8 + n)
+        mm = np.memmap(path, dtype=np.uint8, mode="r")
+        return cls._from_buffer(mm, meta, base=base, owner=mm)
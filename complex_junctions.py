@@ -0,0 +1,226 @@
+"""
+Detection of complex junctions: polygons of the network that are not urban blocks nor
+roundabouts but small, odd shaped areas created by the representation of junctions
+(see ``exploratory_notebooks/i_complex_junctions.ipynb``).
+
+Polygons are classified as 'invalid' (for network analysis, not to confuse with
+invalid geometry) by a shape index combining area and the minimum bounding circle.
+The threshold is the first minimum of the density of the shape index, estimated by
+linear binning and an FFT convolution so it is linear in the number of polygons.
+Roundabouts are excluded using the detection of a ``RoundaboutSimplifier``, so the
+roundabout selection is not run again.
+
+Adjacent invalid polygons are then grouped with the connected components of a sparse
+adjacency matrix, and their forming edges read from the polygon-edge incidence.
+"""
+import warnings
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pygeos
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+def _create_shape_index(polys):
+    """
+    Area, Reock compactness (area over the area of the minimum bounding circle) and
+    shape index (area over the square root of the circle area) of every polygon,
+    computed in bulk.
+    """
+    geoms = polys.geometry.values.data
+    area = pygeos.area(geoms)
+    circle_area = pygeos.area(pygeos.minimum_bounding_circle(geoms))
+
+    return pd.DataFrame(
+        {
+            "area": area,
+            "reock": area / circle_area,
+            "shape_index": area / np.sqrt(circle_area),
+        },
+        index=polys.index,
+    )
+
+
+def _scott_bandwidth(values):
+    """Bandwidth of ``scipy.stats.gaussian_kde`` (Scott's rule) for 1-D values."""
+    return len(values) ** (-1 / 5) * np.std(values, ddof=1)
+
+
+def _binned_kde(values, grid, bandwidth):
+    """
+    Gaussian kernel density of ``values`` on the regular ``grid``. Values are
+    linearly binned on the grid and convolved with the kernel through an FFT, so the
+    cost is O(n + m log m) for n values and m grid points instead of O(n m).
+    """
+    n = len(values)
+    step = grid[1] - grid[0]
+
+    # linear binning: each value is split between its two neighbouring grid points
+    pos = (values - grid[0]) / step
+    inside = (pos >= 0) & (pos < len(grid) - 1)
+    left = np.floor(pos[inside]).astype(int)
+    frac = pos[inside] - left
+    counts = np.bincount(left, weights=1 - frac, minlength=len(grid))
+    counts += np.bincount(left + 1, weights=frac, minlength=len(grid))
+
+    # gaussian kernel sampled on the grid, zero padded against circular wrap-around
+    offsets = np.arange(-len(grid) + 1, len(grid)) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (
+        bandwidth * np.sqrt(2 * np.pi)
+    )
+    size = len(counts) + len(kernel) - 1
+    density = np.fft.irfft(
+        np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size
+    )[len(grid) - 1 : 2 * len(grid) - 1]
+
+    return density / n
+
+
+def _shape_index_threshold(shape_index, upper, n_grid=1024):
+    """
+    First local minimum of the density of ``shape_index`` between 0 and ``upper``.
+    Returns NaN if the density has no minimum in that range.
+    """
+    bandwidth = _scott_bandwidth(shape_index)
+    if not bandwidth > 0 or not upper > 0:
+        return np.nan
+
+    # the grid extends beyond the range so values just outside it are binned, up to
+    # a few times its size for very wide bandwidths
+    step = upper / (n_grid - 1)
+    pad = min(int(np.ceil(4 * bandwidth / step)), 4 * n_grid)
+    grid = np.arange(-pad, n_grid + pad) * step
+    density = _binned_kde(shape_index, grid, bandwidth)
+
+    # strict local minima, as scipy.signal.argrelextrema(density, np.less)
+    inner = density[1:-1]
+    minima = np.flatnonzero((inner < density[:-2]) & (inner < density[2:])) + 1
+    minima = minima[(grid[minima] >= 0) & (grid[minima] <= upper)]
+
+    return grid[minima[0]] if len(minima) else np.nan
+
+
+def invalid_polygons(simplifier, max_area=50000, max_reock=0.7, n_grid=1024):
+    """
+    Selects the polygons of the network that are considered 'invalid' (complex
+    junctions) based on a threshold on the shape index, excluding roundabouts.
+
+    The threshold is the first minimum of the density of the shape index of the
+    polygons that are not roundabouts, searched up to the largest shape index of the
+    polygons smaller than ``max_area`` and less compact than ``max_reock``.
+
+    Parameters
+    ----------
+    simplifier : RoundaboutSimplifier
+        simplifier of the network. Its polygons and detected ``roundabouts`` (with
+        their adjacent polygons) are reused.
+    max_area : float (default 50000)
+        area (in CRS units) of the largest polygon used to bound the threshold
+        search
+    max_reock : float (default 0.7)
+        Reock compactness of the most compact polygon used to bound the threshold
+        search
+    n_grid : int (default 1024)
+        number of points of the density estimate between 0 and the bound
+
+    Returns
+    -------
+    GeoDataFrame
+        invalid polygons with their ``area``, ``reock`` and ``shape_index``. The
+        threshold is stored in ``attrs["shape_index_threshold"]``.
+    """
+    polys = simplifier.polys
+    shape = _create_shape_index(polys)
+
+    # filtering out the selected roundabouts
+    candidates = ~polys.index.isin(simplifier.roundabouts.index.unique())
+    shape = shape[candidates]
+
+    bounded = (shape.area <= max_area) & (shape.reock < max_reock)
+    threshold = np.nan
+    if bounded.any() and len(shape) > 1:
+        threshold = _shape_index_threshold(
+            shape.shape_index.to_numpy(), shape.shape_index[bounded].max(), n_grid
+        )
+    if np.isnan(threshold):
+        warnings.warn(
+            "The density of the shape index has no minimum, no polygon is selected.",
+            UserWarning,
+            stacklevel=2,
+        )
+
+    invalid = shape[shape.shape_index <= threshold]
+    result = polys.loc[invalid.index, [polys.geometry.name]].join(invalid)
+    result.attrs["shape_index_threshold"] = threshold
+
+    return result
+
+
+def invalid_adjacency_grouping(invalid, simplifier):
+    """
+    Groups adjacent invalid polygons and counts the edges forming each of them.
+
+    Two polygons are adjacent when their boundaries share a line (as in a
+    ``unary_union`` of the polygons), found with a single bulk ``touches`` query.
+    Groups are the connected components of the resulting sparse adjacency matrix and
+    forming edges are read from the polygon-edge incidence of the network, built from
+    a single bulk query, so grouping is near-linear in the number of polygons.
+
+    Forming edges are the edges covered by the polygon boundary. Unlike edges
+    covered by the polygon itself (as in the notebook), dangling edges inside the
+    polygon are not counted.
+
+    Parameters
+    ----------
+    invalid : GeoDataFrame
+        invalid polygons, as returned by ``invalid_polygons``
+    simplifier : RoundaboutSimplifier
+        simplifier of the network the polygons come from
+
+    Returns
+    -------
+    grouped_polys : GeoDataFrame
+        invalid polygons indexed by ``group_idx``, with their original label as
+        ``index`` and their number of forming edges as ``num_edges``
+    covered_nodes : GeoDataFrame
+        one row per forming edge with the levels of the edge index, its
+        ``group_idx`` and its end points as ``nodes_pts``
+    """
+    geoms = invalid.geometry.values.data
+    n = len(geoms)
+
+    # adjacency from a single bulk query, keeping the pairs sharing a line
+    left, right = pygeos.STRtree(geoms).query_bulk(geoms, predicate="touches")
+    shared = pygeos.relate_pattern(geoms[left], geoms[right], "****1****")
+    adjacency = sparse.csr_matrix(
+        (np.ones(shared.sum(), dtype=bool), (left[shared], right[shared])),
+        shape=(n, n),
+    )
+    _, groups = connected_components(adjacency, directed=False)
+
+    # forming edges of each polygon from the incidence of the whole network
+    sindex = simplifier.sindex
+    poly_pos = sindex.polys.index.get_indexer(invalid.index)
+    incidence = sindex.incidence.matrix[poly_pos].tocoo()
+    num_edges = np.bincount(incidence.row, minlength=n)
+
+    grouped_polys = invalid.assign(num_edges=num_edges, group_idx=groups)
+    grouped_polys = grouped_polys.reset_index().set_index("group_idx")
+
+    edges = simplifier.edges
+    edge_geoms = edges.geometry.values.data[incidence.col]
+    ends = np.stack(
+        [
+            pygeos.get_coordinates(pygeos.get_point(edge_geoms, 0)),
+            pygeos.get_coordinates(pygeos.get_point(edge_geoms, -1)),
+        ],
+        axis=1,
+    )
+    covered_nodes = edges.index[incidence.col].to_frame(index=False)
+    covered_nodes["group_idx"] = groups[incidence.row]
+    covered_nodes["nodes_pts"] = gpd.GeoSeries(pygeos.multipoints(ends), crs=edges.crs)
+    covered_nodes = gpd.GeoDataFrame(covered_nodes, geometry="nodes_pts")
+
+    return grouped_polys, covered_nodes
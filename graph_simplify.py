@@ -0,0 +1,191 @@
+"""
+Graph-native roundabout simplification.
+
+``roundabout_simplification_graph`` takes a NetworkX MultiGraph (from OSMnx, or from
+``momepy.gdf_to_nx``) and simplifies it in place, without converting it to
+GeoDataFrames and back. Only the edge geometries are pulled out, into a geometry-only
+frame, to detect the roundabouts. The results are applied as graph edits:
+
+- the edges of the roundabouts are removed (and the nodes left without edges)
+- a node is added at the center of every roundabout
+- incoming edges are rewired to the center node and get their extended geometry
+
+Untouched edges, and the attributes of the rewired ones, are never copied.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pygeos
+
+from rabs_simplify import (
+    SpatialIndexContext,
+    _extend_to_centers,
+    _line_endpoints,
+    _rabs_center_points,
+    _selecting_incoming_lines,
+    _selecting_rabs_from_poly,
+)
+
+
+def _node_xy(G, node):
+    """Coordinates of ``node``: ``x``/``y`` attributes (OSMnx) or the key (momepy)."""
+    data = G.nodes[node]
+    if "x" in data:
+        return data["x"], data["y"]
+    return node[0], node[1]
+
+
+def _graph_edges(G, crs=None):
+    """
+    Keys ``(u, v, key)`` of all the edges of ``G`` and a geometry-only GeoDataFrame
+    of their LineStrings indexed by position. Edges without geometry (straight OSMnx
+    edges) get the segment between their nodes.
+    """
+    keys, geoms = [], []
+    for u, v, k, geom in G.edges(keys=True, data="geometry"):
+        keys.append((u, v, k))
+        geoms.append(geom)
+    geoms = gpd.GeoSeries(geoms, crs=crs).values.data
+    missing = np.flatnonzero(pygeos.is_missing(geoms))
+    if len(missing):
+        xy = np.array(
+            [
+                [_node_xy(G, keys[i][0]), _node_xy(G, keys[i][1])]
+                for i in missing
+            ],
+            dtype=float,
+        )
+        geoms[missing] = pygeos.linestrings(xy)
+
+    return keys, gpd.GeoDataFrame(geometry=gpd.GeoSeries(geoms, crs=crs))
+
+
+def _add_center_nodes(G, labels, center_xy):
+    """
+    Adds one node per roundabout at ``center_xy``. Nodes are keyed by their
+    coordinates when the nodes of ``G`` are coordinate tuples (momepy), otherwise
+    by new integer ids with ``x``/``y`` attributes (OSMnx). Returns the node of each
+    label.
+    """
+    coordinate_keys = isinstance(next(iter(G.nodes)), tuple)
+    next_id = max((n for n in G.nodes if isinstance(n, (int, np.integer))), default=-1)
+    nodes = {}
+    for label, (x, y) in zip(labels, center_xy):
+        if coordinate_keys:
+            node = (x, y)
+            G.add_node(node)
+        else:
+            next_id += 1
+            node = next_id
+            G.add_node(node, x=x, y=y)
+        nodes[label] = node
+
+    return nodes
+
+
+def _rewire_incoming(G, keys, edges, incoming_all, rab_multipolygons):
+    """
+    Adds the center nodes of the roundabouts and moves the incoming edges to them,
+    with their extended geometry. Their attribute values are reused as they are.
+    """
+    # new geometries of the incoming edges, as _ext_lines_to_center
+    incoming_pos = incoming_all.index.to_numpy()
+    lines = gpd.GeoSeries(incoming_all.line).values
+    ext_pos, ext_geoms = _extend_to_centers(edges.geometry.values, incoming_pos, lines)
+    ext_geoms = gpd.GeoSeries(ext_geoms, index=ext_pos, crs=edges.crs)
+
+    # center nodes of the roundabouts with incoming edges
+    labels = pd.unique(incoming_all.index_right)
+    center_xy = pygeos.get_coordinates(
+        gpd.GeoSeries(rab_multipolygons.center_pt.loc[labels]).values.data
+    )
+    center_nodes = _add_center_nodes(G, labels, center_xy)
+
+    # end of each incoming edge to rewire: the node nearer the connector line start
+    line_start, _ = _line_endpoints(lines)
+    rewire = {}
+    for pos, label, start in zip(
+        incoming_pos, incoming_all.index_right.to_numpy(), line_start
+    ):
+        u, v, _ = keys[pos]
+        dist_u = np.hypot(*(np.asarray(_node_xy(G, u)) - start))
+        dist_v = np.hypot(*(np.asarray(_node_xy(G, v)) - start))
+        rewire.setdefault(pos, {})[u if dist_u <= dist_v else v] = center_nodes[label]
+
+    for pos, ends in rewire.items():
+        u, v, k = keys[pos]
+        data = G.edges[u, v, k]
+        G.remove_edge(u, v, k)
+        data["geometry"] = ext_geoms[pos]
+        G.add_edge(ends.get(u, u), ends.get(v, v), **data)
+
+
+def roundabout_simplification_graph(
+    G,
+    circom_threshold=0.7,
+    area_threshold=0.85,
+    include_adjacent=True,
+    center_type="centroid",
+    angle_threshold=0,
+    adjacency="geometry",
+    max_forming_edges=3,
+    crs=None,
+):
+    """
+    Version of ``roundabout_simplification`` working on a NetworkX MultiGraph.
+
+    ``G`` is modified in place: roundabout edges are removed, a node is added at the
+    center of every roundabout and incoming edges are rewired to it with their
+    extended ``geometry``. All other edge attributes are kept as they are. Note that
+    some attributes, like length, may no longer reflect the reality of newly
+    constructed geometry.
+
+    Parameters
+    ----------
+    G : networkx.MultiGraph
+        graph of the urban network with LineString ``geometry`` on its edges (edges
+        without it are taken as straight segments between their nodes) and node
+        coordinates as ``x``/``y`` attributes or as node keys
+    circom_threshold, area_threshold, include_adjacent, center_type, angle_threshold
+        see ``roundabout_simplification``
+    adjacency, max_forming_edges
+        see ``roundabout_simplification``
+    crs : str, int or pyproj.CRS (default None)
+        CRS of the geometries, defaults to ``G.graph["crs"]`` if set
+
+    Returns
+    -------
+    networkx.MultiGraph
+        ``G``, simplified
+    """
+    if crs is None:
+        crs = G.graph.get("crs")
+    keys, edges = _graph_edges(G, crs=crs)
+
+    sindex = SpatialIndexContext(edges)
+    rab = _selecting_rabs_from_poly(
+        sindex.polys,
+        circom_threshold=circom_threshold,
+        area_threshold=area_threshold,
+        include_adjacent=include_adjacent,
+        sindex=sindex,
+        adjacency=adjacency,
+        max_forming_edges=max_forming_edges,
+    )
+    if rab.empty:
+        return G
+    rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
+    incoming_all, idx_drop = _selecting_incoming_lines(
+        rab_multipolygons, edges, angle_threshold=angle_threshold, sindex=sindex
+    )
+
+    if not incoming_all.empty:
+        _rewire_incoming(G, keys, edges, incoming_all, rab_multipolygons)
+
+    # deleting the original roundabout edges and the nodes left without edges
+    dropped = [keys[pos] for pos in idx_drop]
+    G.remove_edges_from(dropped)
+    orphans = {n for u, v, _ in dropped for n in (u, v) if G.degree(n) == 0}
+    G.remove_nodes_from(orphans)
+
+    return G
@@ -0,0 +1,97 @@
+"""
+Sparse polygon × edge incidence of a polygonized network.
+
+An edge is incident to a polygon when it lies on the polygon boundary, i.e. it is one
+of the edges forming the polygon. The incidence is stored as a boolean CSR matrix
+built once from the polygonization, and the topological queries used to select the
+polygons adjacent to a roundabout are sparse matrix operations:
+
+- number of forming edges of each polygon (row sums)
+- polygons sharing at least one edge (``I @ I.T``)
+- neighbours within ``k`` shared-edge hops (``k`` sparse products)
+
+All of them scale linearly with the size of the network.
+"""
+import numpy as np
+import pygeos
+from scipy import sparse
+
+
+class PolygonEdgeIncidence:
+    """
+    Boolean sparse matrix of ``n_polys`` rows and ``n_edges`` columns, True where
+    the edge forms part of the boundary of the polygon. Rows and columns are
+    positions in the polygons and edges the incidence was built from.
+
+    Parameters
+    ----------
+    poly_pos, edge_pos : array of int
+        positions of the incident (polygon, edge) pairs
+    n_polys, n_edges : int
+        number of polygons and edges
+    """
+
+    def __init__(self, poly_pos, edge_pos, n_polys, n_edges):
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(poly_pos), dtype=bool), (poly_pos, edge_pos)),
+            shape=(n_polys, n_edges),
+        )
+        self._adjacency = None
+
+    @classmethod
+    def from_sindex(cls, sindex):
+        """
+        Incidence of the polygons and edges of a ``SpatialIndexContext``, from a
+        single bulk query of the polygon boundaries against the edges.
+        """
+        boundaries = pygeos.boundary(sindex.polys.geometry.values.data)
+        poly_pos, edge_pos, masks = sindex.query_edges(boundaries, ["covered_by"])
+        covered = masks["covered_by"]
+
+        return cls(
+            poly_pos[covered], edge_pos[covered], len(sindex.polys), len(sindex.edges)
+        )
+
+    def forming_edges(self):
+        """Number of edges forming each polygon."""
+        return np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    @property
+    def adjacency(self):
+        """
+        Sparse ``n_polys`` × ``n_polys`` matrix with the number of edges shared by
+        every pair of distinct polygons.
+        """
+        if self._adjacency is None:
+            incidence = self.matrix.astype(np.int32)
+            adjacency = (incidence @ incidence.T).tocsr()
+            adjacency.setdiag(0)
+            adjacency.eliminate_zeros()
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def neighbours(self, positions, k=1):
+        """
+        Polygons within ``k`` shared-edge hops of the polygons at ``positions``,
+        including the polygons themselves.
+
+        Returns
+        -------
+        tuple of arrays
+            position in ``positions`` of the seed and position of the neighbouring
+            polygon for every pair, sorted by seed
+        """
+        positions = np.asarray(positions)
+        n = self.matrix.shape[0]
+        seeds = np.arange(len(positions))
+        reach = sparse.csr_matrix(
+            (np.ones(len(positions), dtype=bool), (seeds, positions)),
+            shape=(len(positions), n),
+        )
+        step = self.adjacency.astype(bool)
+        for _ in range(k):
+            reach = reach + reach @ step
+        reach = reach.tocoo()
+        order = np.lexsort((reach.col, reach.row))
+
+        return reach.row[order], reach.col[order]
@@ -0,0 +1,639 @@
+"""
+Incremental roundabout simplification.
+
+``roundabout_simplification_with_state`` runs the simplification and also returns a
+``SimplificationState``. ``update_roundabout_simplification`` takes that state and a
+diff of edges (added, removed or modified), re-polygonizes only the area around the
+changed edges, recomputes the roundabouts whose polygons touch it and patches the
+output kept in the state. The result equals a full re-run on the updated edges (up
+to row order: patched rows are appended at the end).
+
+Every structure of the state is updated in time proportional to the change rather
+than to the size of the network:
+
+- edges, polygons and output are ``IncrementalFrame``: append-only runs of rows
+  with tombstones for removed rows, and an STRtree per run
+- polygon areas are kept sorted in buckets, so the area quantile and the polygons
+  whose selection flips with it are found without sorting all areas
+- roundabout groups, incoming and dropped edges are indexed both by roundabout and
+  by label
+
+If a change cannot be resolved locally (e.g. a new edge closing a block outside the
+polygonized network), the update falls back to a full run.
+"""
+from bisect import bisect_left, insort
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pygeos
+
+from rabs_simplify import (
+    SpatialIndexContext,
+    _ext_lines_to_center,
+    _polygon_metrics,
+    _rab_groups,
+    _rabs_center_points,
+    _selecting_incoming_lines,
+    _selecting_rabs_from_poly,
+)
+
+# growths of the re-polygonized region before falling back to a full run
+_MAX_REGION_EXPANSIONS = 4
+
+
+class IncrementalFrame:
+    """
+    Uniquely labelled rows of a (Geo)DataFrame updated in time proportional to the
+    change.
+
+    Rows are stored in runs. Appended rows form a new run and removed rows are
+    marked dead (tombstones) instead of rebuilding the frame. The last run is merged
+    into the previous one, without its dead rows, while it holds at least half as
+    many rows, so there are O(log n) runs and each row is copied O(log n) times. A
+    run more than half dead is compacted. An STRtree per run is built on the first
+    spatial query.
+
+    Parameters
+    ----------
+    frame : DataFrame or GeoDataFrame
+        initial rows, with a unique index. It is not copied nor modified.
+    """
+
+    def __init__(self, frame):
+        self.empty = frame.iloc[:0]
+        self.runs = []
+        self.alive = []
+        self.counts = []
+        self.trees = []
+        self.append(frame)
+
+    def __getstate__(self):
+        # STRtree cannot be pickled, they are rebuilt on first query
+        state = self.__dict__.copy()
+        state["trees"] = [None] * len(self.runs)
+        return state
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def append(self, frame):
+        """Appends the rows of ``frame``, whose labels must not be alive."""
+        if len(frame) == 0:
+            return
+        self.runs.append(frame)
+        self.alive.append(np.ones(len(frame), dtype=bool))
+        self.counts.append(len(frame))
+        self.trees.append(None)
+        while len(self.runs) > 1 and 2 * self.counts[-1] >= self.counts[-2]:
+            merged = pd.concat(
+                [self.runs[-2][self.alive[-2]], self.runs[-1][self.alive[-1]]]
+            )
+            for attr in (self.runs, self.alive, self.counts, self.trees):
+                del attr[-2:]
+            self.runs.append(merged)
+            self.alive.append(np.ones(len(merged), dtype=bool))
+            self.counts.append(len(merged))
+            self.trees.append(None)
+
+    def _positions(self, labels):
+        """Run and positions of the alive rows of ``labels``."""
+        for r, run in enumerate(self.runs):
+            pos = run.index.get_indexer(labels)
+            pos = pos[pos >= 0]
+            pos = pos[self.alive[r][pos]]
+            if len(pos):
+                yield r, pos
+
+    def remove(self, labels):
+        """Marks the rows of ``labels`` as dead. Missing labels are ignored."""
+        for r, pos in list(self._positions(pd.Index(labels))):
+            self.alive[r][pos] = False
+            self.counts[r] -= len(pos)
+            if self.counts[r] < len(self.runs[r]) / 2:
+                self.runs[r] = self.runs[r][self.alive[r]]
+                self.alive[r] = np.ones(self.counts[r], dtype=bool)
+                self.trees[r] = None
+
+    def loc(self, labels):
+        """Alive rows of ``labels``, in storage order."""
+        parts = [
+            self.runs[r].iloc[pos] for r, pos in self._positions(pd.Index(labels))
+        ]
+        if not parts:
+            return self.empty
+        return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+    def query_pairs(self, geoms, predicate="intersects"):
+        """
+        Positions in ``geoms`` and labels of the alive rows for which
+        ``geom <predicate> row geometry`` holds.
+        """
+        geom_pos, labels = [np.empty(0, dtype=np.intp)], [self.empty.index]
+        for r, run in enumerate(self.runs):
+            if self.trees[r] is None:
+                self.trees[r] = pygeos.STRtree(run.geometry.values.data)
+            g, pos = self.trees[r].query_bulk(geoms, predicate=predicate)
+            alive = self.alive[r][pos]
+            geom_pos.append(g[alive])
+            labels.append(run.index[pos[alive]])
+
+        return np.concatenate(geom_pos), labels[0].append(labels[1:])
+
+    def query(self, geoms, predicate="intersects"):
+        """Unique labels of the alive rows intersecting any of ``geoms``."""
+        return self.query_pairs(geoms, predicate)[1].unique()
+
+    def to_frame(self):
+        """All the alive rows as a single frame."""
+        return pd.concat(
+            [self.empty] + [run[alive] for run, alive in zip(self.runs, self.alive)]
+        )
+
+
+class _SortedAreas:
+    """
+    Sorted multiset of ``(area, label)`` stored in buckets of bounded size (a
+    simplified sorted list), so adding and removing polygons and reading the area
+    quantile cost O(sqrt(n)) instead of sorting every area.
+    """
+
+    _LOAD = 1000
+
+    def __init__(self, areas, labels):
+        items = sorted(zip(np.asarray(areas).tolist(), list(labels)))
+        self.buckets = [
+            items[i : i + self._LOAD] for i in range(0, len(items), self._LOAD)
+        ]
+        self.maxes = [b[-1] for b in self.buckets]
+        self.n = len(items)
+
+    def __len__(self):
+        return self.n
+
+    def add(self, area, label):
+        item = (area, label)
+        self.n += 1
+        if not self.buckets:
+            self.buckets, self.maxes = [[item]], [item]
+            return
+        i = min(bisect_left(self.maxes, item), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, item)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self._LOAD:
+            self.buckets[i : i + 1] = [bucket[: self._LOAD], bucket[self._LOAD :]]
+            self.maxes[i : i + 1] = [bucket[self._LOAD - 1], bucket[-1]]
+
+    def remove(self, area, label):
+        item = (area, label)
+        i = bisect_left(self.maxes, item)
+        bucket = self.buckets[i]
+        del bucket[bisect_left(bucket, item)]
+        self.n -= 1
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i], self.maxes[i]
+
+    def kth(self, k):
+        """``k``-th smallest area."""
+        for bucket in self.buckets:
+            if k < len(bucket):
+                return bucket[k][0]
+            k -= len(bucket)
+        raise IndexError(k)
+
+    def quantile(self, q):
+        """Quantile ``q`` of the areas, interpolated as ``numpy.quantile``."""
+        if self.n == 0:
+            return np.nan
+        h = (self.n - 1) * q
+        lo = int(np.floor(h))
+        a, b = self.kth(lo), self.kth(min(lo + 1, self.n - 1))
+        t = h - lo
+        # numpy's lerp, exact at both ends
+        return a + (b - a) * t if t < 0.5 else b - (b - a) * (1 - t)
+
+    def labels_between(self, low, high):
+        """Labels of the polygons with ``low <= area < high``."""
+        labels = []
+        i = bisect_left(self.maxes, (low,))
+        for bucket in self.buckets[i:]:
+            for area, label in bucket[bisect_left(bucket, (low,)) :]:
+                if area >= high:
+                    return labels
+                labels.append(label)
+        return labels
+
+
+class _Links:
+    """
+    Rows (roundabout members, incoming or dropped edges) attached to roundabouts
+    through their ``index_right``, indexed both by roundabout and by row label so
+    either can be looked up or removed in time proportional to the result.
+    """
+
+    def __init__(self, frame):
+        self.empty = frame.iloc[:0]
+        self.by_rab = {}
+        self.by_label = {}
+        self.add(frame)
+
+    def __contains__(self, label):
+        return label in self.by_label
+
+    def add(self, frame):
+        for rab, rows in frame.groupby("index_right", sort=False):
+            if rab in self.by_rab:
+                rows = pd.concat([self.by_rab[rab], rows])
+            self.by_rab[rab] = rows
+        for label, rab in zip(frame.index, frame["index_right"]):
+            self.by_label.setdefault(label, set()).add(rab)
+
+    def remove(self, rabs):
+        """Detaches the rows of ``rabs``. Returns their labels."""
+        labels = [self.empty.index]
+        for rab in rabs:
+            rows = self.by_rab.pop(rab, None)
+            if rows is None:
+                continue
+            labels.append(rows.index)
+            for label in rows.index:
+                attached = self.by_label.get(label)
+                if attached is not None:
+                    attached.discard(rab)
+                    if not attached:
+                        del self.by_label[label]
+        return labels[0].append(labels[1:])
+
+    def rabs_of(self, labels):
+        """Roundabouts the rows of ``labels`` are attached to."""
+        rabs = set()
+        for label in labels:
+            rabs.update(self.by_label.get(label, ()))
+        return rabs
+
+    def rows(self, labels):
+        """Rows of ``labels``, for every roundabout they are attached to."""
+        labels = pd.Index(labels)
+        rabs = self.rabs_of(labels)
+        if not rabs:
+            return self.empty
+        frame = pd.concat([self.by_rab[rab] for rab in sorted(rabs)])
+        return frame[frame.index.isin(labels)]
+
+    def frame(self):
+        """All the rows."""
+        return pd.concat([self.empty] + list(self.by_rab.values()))
+
+
+class SimplificationState:
+    """
+    Intermediate results of a roundabout simplification needed to update it.
+    ``update_roundabout_simplification`` updates it in place.
+
+    Attributes
+    ----------
+    edges : IncrementalFrame
+        input edges
+    polys : IncrementalFrame
+        polygons of ``edges`` with their ``area`` and ``circom``
+    output : IncrementalFrame
+        simplified edges, ``output.to_frame()`` returns them as a GeoDataFrame
+    groups, incoming, dropped
+        polygons of each roundabout, incoming edges (with their connector ``line``)
+        and edges covered by a roundabout, by roundabout (``index_right``) and label
+    area_threshold_val : float
+        area above which polygons are not considered roundabouts
+    params : dict
+        parameters of the simplification
+    """
+
+    def __init__(
+        self, edges, polys, output, rab, incoming, dropped, area_threshold_val, params
+    ):
+        self.edges = IncrementalFrame(edges)
+        self.polys = IncrementalFrame(polys)
+        self.output = IncrementalFrame(output)
+        self.groups = _Links(pd.DataFrame({"index_right": rab.index_right}))
+        self.incoming = _Links(incoming)
+        self.dropped = _Links(dropped)
+        self.area_threshold_val = area_threshold_val
+        self.params = params
+        self.areas = _SortedAreas(polys["area"], polys.index)
+        compact = polys[polys["circom"] > params["circom_threshold"]]
+        self.compact_areas = _SortedAreas(compact["area"], compact.index)
+        self.next_poly_label = polys.index.max() + 1 if len(polys) else 0
+
+
+def _empty_lines(index):
+    """Empty incoming / dropped records."""
+    incoming = pd.DataFrame(
+        {
+            "index_right": np.array([], dtype=np.int64),
+            "line": gpd.array.GeometryArray(np.array([], dtype=object)),
+        },
+        index=index[:0],
+    )
+    dropped = pd.DataFrame(
+        {"index_right": np.array([], dtype=np.int64)}, index=index[:0]
+    )
+    return incoming, dropped
+
+
+def _groups_lines(rab, edges, center_type, angle_threshold, exclude=None, sindex=None):
+    """
+    Incoming and dropped edges of the roundabout groups ``rab``. Edges in ``exclude``
+    (any container of labels dropped by roundabouts computed elsewhere) are not
+    considered incoming.
+    """
+    if rab.empty:
+        return _empty_lines(edges.index)
+
+    rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
+    if sindex is None:
+        sindex = SpatialIndexContext(edges)
+    rab_pos, edge_pos, masks = sindex.query_edges(
+        rab_multipolygons.geometry.values.data, ["covered_by"]
+    )
+    covered = masks["covered_by"]
+    dropped = pd.DataFrame(
+        {"index_right": rab_multipolygons.index[rab_pos[covered]]},
+        index=edges.index[edge_pos[covered]],
+    )
+
+    candidates = edges
+    if exclude is not None:
+        excluded = np.fromiter(
+            (label in exclude for label in edges.index), dtype=bool, count=len(edges)
+        )
+        if excluded.any():
+            candidates = edges[~excluded]
+            sindex = None
+    incoming_all, _ = _selecting_incoming_lines(
+        rab_multipolygons, candidates, angle_threshold=angle_threshold, sindex=sindex
+    )
+    incoming = pd.DataFrame(
+        {
+            "index_right": incoming_all.index_right.to_numpy(),
+            "line": gpd.GeoSeries(incoming_all.line).values,
+        },
+        index=incoming_all.index,
+    )
+
+    return incoming, dropped
+
+
+def roundabout_simplification_with_state(
+    edges,
+    circom_threshold=0.7,
+    area_threshold=0.85,
+    include_adjacent=True,
+    center_type="centroid",
+    angle_threshold=0,
+):
+    """
+    Same as ``roundabout_simplification`` (see its parameters), also returning the
+    ``SimplificationState`` needed by ``update_roundabout_simplification``.
+
+    Returns
+    -------
+    output : GeoDataFrame
+        GeoDataFrame with an updated geometry
+    state : SimplificationState
+    """
+    params = dict(
+        circom_threshold=circom_threshold,
+        area_threshold=area_threshold,
+        include_adjacent=include_adjacent,
+        center_type=center_type,
+        angle_threshold=angle_threshold,
+    )
+    sindex = SpatialIndexContext(edges)
+    polys = sindex.polys.assign(
+        area=sindex.metrics["area"].to_numpy(),
+        circom=sindex.metrics["circom"].to_numpy(),
+    )
+    area_threshold_val = polys["area"].quantile(area_threshold)
+    rab = _selecting_rabs_from_poly(
+        sindex.polys,
+        circom_threshold=circom_threshold,
+        include_adjacent=include_adjacent,
+        area_threshold_val=area_threshold_val,
+        sindex=sindex,
+    )
+    incoming, dropped = _groups_lines(
+        rab, edges, center_type, angle_threshold, sindex=sindex
+    )
+    output = _ext_lines_to_center(edges, incoming, dropped.index.unique())
+    state = SimplificationState(
+        edges, polys, output, rab, incoming, dropped, area_threshold_val, params
+    )
+
+    return output, state
+
+
+def _roundabouts_among(labels, polys, params, area_threshold_val):
+    """Labels of ``labels`` still in ``polys`` that are selected as roundabouts."""
+    rows = polys.loc(pd.Index(labels).unique())
+    selected = (rows["circom"] > params["circom_threshold"]) & (
+        rows["area"] < area_threshold_val
+    )
+    return rows.index[selected.to_numpy()]
+
+
+def _local_faces(edges, affected, dirty):
+    """
+    Polygons replacing the ``affected`` ones (pygeos array) after the ``dirty``
+    edge geometries changed. ``edges`` (an ``IncrementalFrame``) are polygonized
+    within a box around the change, grown until every new face inside the affected
+    area fits in it.
+
+    Returns None if the region does not stabilize.
+    """
+    region = np.concatenate([affected, dirty])
+    bounds = pygeos.total_bounds(region)
+    affected_tree = pygeos.STRtree(affected)
+
+    for _ in range(_MAX_REGION_EXPANSIONS):
+        labels = edges.query(np.array([pygeos.box(*bounds)]))
+        # not through _polygonize_ifnone, local results would fill its cache
+        faces = pygeos.get_parts(
+            pygeos.polygonize(edges.loc(labels).geometry.values.data)
+        )
+        # faces outside the affected polygons are unchanged
+        face_pos, _ = affected_tree.query_bulk(
+            pygeos.point_on_surface(faces), predicate="intersects"
+        )
+        faces = faces[np.unique(face_pos)]
+        # faces reaching the border of the region may be missing edges
+        face_bounds = pygeos.bounds(faces).reshape(-1, 4)
+        inside = (face_bounds[:, :2] >= bounds[:2]).all(axis=1) & (
+            face_bounds[:, 2:] <= bounds[2:]
+        ).all(axis=1)
+        if inside.all():
+            return faces
+        bounds = pygeos.total_bounds(
+            np.concatenate([[pygeos.box(*bounds)], faces[~inside]])
+        )
+
+    return None
+
+
+def _update_areas(state, removed, added):
+    """Moves the polygons ``removed`` out of and ``added`` into the sorted areas."""
+    threshold = state.params["circom_threshold"]
+    for sign, polys in ((-1, removed), (1, added)):
+        for label, area, circom in zip(polys.index, polys["area"], polys["circom"]):
+            areas = [state.areas]
+            if circom > threshold:
+                areas.append(state.compact_areas)
+            for sorted_areas in areas:
+                if sign < 0:
+                    sorted_areas.remove(area, label)
+                else:
+                    sorted_areas.add(area, label)
+
+
+def update_roundabout_simplification(state, added=None, removed=None, modified=None):
+    """
+    Updates a roundabout simplification after some ``edges`` changed, recomputing
+    only the polygons and roundabouts around the changed edges. Every step takes time
+    proportional to the change, except the fall back to a full run.
+
+    Parameters
+    ----------
+    state : SimplificationState
+        state of the previous run (``roundabout_simplification_with_state`` or
+        ``update_roundabout_simplification``). It is updated in place; use the
+        returned state, which is a new one after a fall back to a full run.
+    added : GeoDataFrame (default None)
+        new edges, with labels not present in ``state.edges``
+    removed : list-like (default None)
+        labels of deleted edges
+    modified : GeoDataFrame (default None)
+        edges of ``state.edges`` with a new geometry or attributes
+
+    Returns
+    -------
+    SimplificationState
+        updated state, the simplified edges are ``state.output.to_frame()``
+    """
+    params = state.params
+    edges, polys = state.edges, state.polys
+    columns = edges.empty.columns
+    added = edges.empty if added is None else added[columns]
+    modified = edges.empty if modified is None else modified[columns]
+    removed = edges.empty.index if removed is None else pd.Index(removed)
+    changed = removed.append(modified.index)
+    new_edges = pd.concat([modified, added])
+
+    old_geoms = edges.loc(changed).geometry.values.data
+    new_geoms = new_edges.geometry.values.data
+    dirty = np.concatenate([old_geoms, new_geoms])
+    if len(dirty) == 0:
+        return state
+
+    # new edges must lie within existing polygons to be polygonized locally
+    geom_pos, _ = polys.query_pairs(new_geoms, predicate="covered_by")
+    edges.remove(changed)
+    edges.append(new_edges)
+    if len(np.unique(geom_pos)) < len(new_geoms):
+        return roundabout_simplification_with_state(edges.to_frame(), **params)[1]
+
+    # re-polygonizing around the changed edges
+    affected = polys.query(dirty)
+    affected_polys = polys.loc(affected)
+    faces = _local_faces(edges, affected_polys.geometry.values.data, dirty)
+    if faces is None:
+        return roundabout_simplification_with_state(edges.to_frame(), **params)[1]
+
+    new_polys = gpd.GeoDataFrame(
+        geometry=gpd.array.GeometryArray(faces),
+        index=pd.RangeIndex(state.next_poly_label, state.next_poly_label + len(faces)),
+        crs=new_edges.crs,
+    )
+    metrics = _polygon_metrics(new_polys)
+    new_polys = new_polys.assign(
+        area=metrics["area"].to_numpy(), circom=metrics["circom"].to_numpy()
+    )
+    polys.remove(affected)
+    polys.append(new_polys)
+    _update_areas(state, affected_polys, new_polys)
+    state.next_poly_label += len(faces)
+
+    # polygons whose selection flips with the updated area quantile
+    area_threshold_val = state.areas.quantile(params["area_threshold"])
+    low, high = sorted([state.area_threshold_val, area_threshold_val])
+    flipped = pd.Index(state.compact_areas.labels_between(low, high))
+    state.area_threshold_val = area_threshold_val
+
+    # roundabouts whose polygons touch the changed area are recomputed
+    zone = np.concatenate(
+        [
+            affected_polys.geometry.values.data,
+            faces,
+            polys.loc(flipped).geometry.values.data,
+        ]
+    )
+    zone_polys = polys.query(zone)
+    retired = pd.Index(sorted(state.groups.rabs_of(zone_polys.append(affected))))
+    mains = _roundabouts_among(
+        zone_polys.append(retired), polys, params, area_threshold_val
+    )
+
+    touched = [changed, added.index]
+    while True:
+        touched += [state.incoming.remove(retired), state.dropped.remove(retired)]
+        state.groups.remove(retired)
+
+        if len(mains):
+            members = polys.query(polys.loc(mains).geometry.values.data)
+            local = polys.loc(members.union(mains))
+            rab = _rab_groups(
+                local, local.loc[mains], include_adjacent=params["include_adjacent"]
+            )
+            local_edges = edges.loc(edges.query(local.geometry.values.data))
+            incoming, dropped = _groups_lines(
+                rab,
+                local_edges,
+                params["center_type"],
+                params["angle_threshold"],
+                exclude=state.dropped,
+            )
+        else:
+            rab = None
+            incoming, dropped = _empty_lines(edges.empty.index)
+
+        # lines now covered by a recomputed roundabout change the incoming lines of
+        # the roundabouts they were extended to
+        conflicts = state.incoming.rabs_of(dropped.index)
+        if not conflicts:
+            break
+        retired = pd.Index(sorted(conflicts))
+        mains = mains.union(
+            _roundabouts_among(retired, polys, params, area_threshold_val)
+        )
+
+    if rab is not None:
+        state.groups.add(pd.DataFrame({"index_right": rab.index_right}))
+    state.incoming.add(incoming)
+    state.dropped.add(dropped)
+
+    # patching the output rows of every edge whose geometry may have changed
+    touched = touched[0].append(touched[1:] + [incoming.index, dropped.index]).unique()
+    state.output.remove(touched)
+    rebuilt = edges.loc(touched)
+    kept = np.fromiter(
+        (label not in state.dropped for label in rebuilt.index),
+        dtype=bool,
+        count=len(rebuilt),
+    )
+    rebuilt = rebuilt[kept]
+    rebuilt = _ext_lines_to_center(
+        rebuilt, state.incoming.rows(rebuilt.index), rebuilt.index[:0]
+    )
+    state.output.append(rebuilt)
+
+    return state
@@ -0,0 +1,115 @@
+"""
+Per-stage instrumentation of ``roundabout_simplification``.
+
+A ``StageCollector`` passed as ``collector`` records, for every internal stage, the
+elapsed time, the peak memory allocated during the stage (traced with
+``tracemalloc``) and the cardinalities the stage handled. Stages can optionally be
+wrapped in a sampling profiler (``pyinstrument``).
+
+When no collector is passed, stages run inside a shared ``nullcontext`` and the
+cardinalities are not computed, so the overhead is a few attribute lookups per
+stage.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# context of the stages when no collector is attached; yields None
+_NO_STAGE = nullcontext()
+
+
+def stage(collector, name):
+    """
+    Context manager timing the stage ``name`` with ``collector``. Yields the record
+    of the stage (a dict to be filled with cardinalities), or None if ``collector``
+    is None.
+    """
+    if collector is None:
+        return _NO_STAGE
+    return collector.stage(name)
+
+
+class StageCollector:
+    """
+    Collects one record per stage of ``roundabout_simplification``.
+
+    Each record is a dict with the ``stage`` name, ``seconds``, ``peak_bytes`` (peak
+    memory allocated above the memory in use when the stage started, if ``memory``
+    is True), the cardinalities of the stage and, for profiled stages, the
+    ``pyinstrument.Profiler`` under ``profile``.
+
+    Memory is only traced when ``tracemalloc`` is not already tracing. A session
+    started by the caller is left untouched, its peak included, and ``peak_bytes``
+    is None.
+
+    Parameters
+    ----------
+    callback : callable (default None)
+        Called with every record as soon as its stage finishes.
+    memory : boolean (default True)
+        Trace memory allocations with ``tracemalloc``. Tracing slows down the
+        stages; set to False when only timings are needed.
+    profile : iterable of str (default ())
+        Names of the stages to run under a sampling profiler. Requires
+        ``pyinstrument``.
+
+    Examples
+    --------
+    >>> collector = StageCollector(profile=["incoming_lines"])
+    >>> simplified = roundabout_simplification(edges, collector=collector)
+    >>> collector.to_frame()
+    >>> print(collector.records[3]["profile"].output_text())
+    """
+
+    def __init__(self, callback=None, memory=True, profile=()):
+        self.callback = callback
+        self.memory = memory
+        self.profile = set(profile)
+        if self.profile and pyinstrument is None:
+            raise ImportError(
+                "Profiling stages requires `pyinstrument`. "
+                "Install it with `pip install pyinstrument`."
+            )
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        record = {"stage": name}
+        profiler = None
+        if name in self.profile:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        # the caller's tracemalloc session, if any, is not reset
+        traced = self.memory and not tracemalloc.is_tracing()
+        if traced:
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if traced:
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+                tracemalloc.stop()
+            elif self.memory:
+                record["peak_bytes"] = None
+            if profiler is not None:
+                profiler.stop()
+                record["profile"] = profiler
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def to_frame(self):
+        """Records as a DataFrame indexed by stage, without the profiles."""
+        return pd.DataFrame(
+            [{k: v for k, v in r.items() if k != "profile"} for r in self.records]
+        ).set_index("stage")
@@ -0,0 +1,106 @@
+"""
+On-disk cache of derived polygon data (polygons and their metrics).
+
+Like the Overpass responses in ``cache/``, entries are content addressed: the file
+name is the SHA-1 of the input network hash and the metric version. Each entry is
+an uncompressed ``.npz`` holding the polygons as flat ring coordinates with the
+ring of each coordinate and the polygon of each ring, plus one array per metric, so
+loading rebuilds all the polygons in two vectorized calls.
+
+The directory is bounded in size; least recently used entries are evicted first.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pygeos
+
+
+def cache_key(*parts):
+    """SHA-1 of the string representation of ``parts``."""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def load_metrics(cache_dir, key):
+    """
+    Loads the entry ``key`` from ``cache_dir``.
+
+    Returns
+    -------
+    tuple or None
+        array of pygeos geometries and dict of metric arrays, None if the entry is
+        not cached.
+    """
+    path = os.path.join(cache_dir, f"{key}.npz")
+    try:
+        with np.load(path) as data:
+            if "coords" not in data.files:
+                # entry of an older layout, overwritten by the next save
+                return None
+            coords = data["coords"]
+            ring_index = data["ring_index"]
+            poly_index = data["poly_index"]
+            columns = {
+                k[len("col_") :]: data[k] for k in data.files if k.startswith("col_")
+            }
+    except FileNotFoundError:
+        return None
+
+    # marking the entry as recently used for eviction, unless it was just evicted
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    # the first ring of each polygon is its shell, the others its holes
+    rings = pygeos.linearrings(coords, indices=ring_index)
+    geoms = pygeos.polygons(rings, indices=poly_index)
+
+    return geoms, columns
+
+
+def save_metrics(cache_dir, key, geoms, columns, max_bytes=2**30):
+    """
+    Stores ``geoms`` (array of pygeos polygons, none of them empty) and ``columns``
+    (dict of 1-D arrays aligned with ``geoms``) as the entry ``key`` of
+    ``cache_dir``, then evicts the least recently used entries above ``max_bytes``.
+
+    The entry is written to a temporary file and moved in place, so concurrent
+    readers never see a partial file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    rings, poly_index = pygeos.get_rings(geoms, return_index=True)
+    coords, ring_index = pygeos.get_coordinates(rings, return_index=True)
+    arrays = {f"col_{k}": np.asarray(v) for k, v in columns.items()}
+
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(
+            f,
+            coords=coords,
+            ring_index=ring_index,
+            poly_index=poly_index,
+            **arrays,
+        )
+    os.replace(tmp, os.path.join(cache_dir, f"{key}.npz"))
+
+    _evict(cache_dir, max_bytes)
+
+
+def _evict(cache_dir, max_bytes):
+    """Removes the least recently used entries until ``cache_dir`` fits."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npz"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,405 @@
+"""
+Concurrent, cache-first fetcher of Overpass street networks.
+
+``fetch_overpass`` splits a bounding box into sub-queries no larger than
+``max_query_area_size`` (as ``osmnx`` does for large areas) and runs them
+concurrently with ``asyncio`` over a single pooled ``aiohttp`` session. Requests are
+spaced to respect the server rate limit and retried with exponential backoff (or the
+``Retry-After`` the server asks for) on 429 and 5xx responses, timeouts and
+connection errors.
+
+Every sub-query is first looked up in the ``cache/`` store, keyed like ``osmnx``
+by the SHA-1 of the request URL with its query, and only the missing ones are
+fetched and written to it. The responses are merged keeping every node and way once,
+ready for ``load_overpass_edges``. ``osmnx`` builds different queries (polygon
+filters and its own settings), so the responses it cached are not found by their
+key; ``serve_cache`` answers from them instead.
+
+``serve_cache`` starts a local stand-in Overpass server answering bounding box
+queries from the cached responses, to use the fetcher offline::
+
+    server, url = serve_cache(glob.glob("cache/*.json"))
+    response = fetch_overpass(bbox, url=url, cache_folder=tmp_dir)
+    server.shutdown()
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from overpass_loader import _iter_elements
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+CACHE_FOLDER = "cache"
+# default of osmnx ``max_query_area_size``, in square meters
+MAX_QUERY_AREA_SIZE = 50 * 1000 * 50 * 1000
+# status codes worth retrying, the server is busy or rate limiting
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class OverpassError(RuntimeError):
+    pass
+
+
+def _cache_key(url, query):
+    """
+    SHA-1 of the GET URL of ``query``, derived as the key of the ``osmnx`` cache.
+    Only the queries built by ``_overpass_query`` are looked up: the files ``osmnx``
+    wrote for its own ``poly:`` queries have other keys and are never hit.
+    """
+    return hashlib.sha1(f"{url}?{urlencode({'data': query})}".encode()).hexdigest()
+
+
+def _read_cache(path):
+    """Cached response at ``path``, None if missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, response):
+    """Writes ``response`` to a temporary file next to ``path``, then moves it."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(response, f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _split_bbox(bbox, max_query_area_size=MAX_QUERY_AREA_SIZE):
+    """
+    Splits ``bbox`` (west, south, east, north in degrees) into a regular grid of
+    cells smaller than ``max_query_area_size`` square meters.
+    """
+    west, south, east, north = bbox
+    lat = math.radians((south + north) / 2)
+    area = (east - west) * 111320 * math.cos(lat) * (north - south) * 110574
+    n = max(1, math.ceil(math.sqrt(area / max_query_area_size)))
+    xs = np.linspace(west, east, n + 1)
+    ys = np.linspace(south, north, n + 1)
+
+    return [
+        (xs[i], ys[j], xs[i + 1], ys[j + 1]) for j in range(n) for i in range(n)
+    ]
+
+
+def _overpass_query(bbox, custom_filter='["highway"]', timeout=180):
+    """Query of the ways matching ``custom_filter`` in ``bbox`` and their nodes."""
+    west, south, east, north = bbox
+    return (
+        f"[out:json][timeout:{timeout}];"
+        f"(way{custom_filter}({south:.7f},{west:.7f},{north:.7f},{east:.7f});>;);out;"
+    )
+
+
+class _RateLimiter:
+    """Spaces the start of requests by ``1 / rate`` seconds, shared by all tasks."""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Delays every following request by ``seconds``, when the server asks to."""
+        self._next = max(self._next, asyncio.get_running_loop().time() + seconds)
+
+
+def _retry_delay(retry_after, attempt, backoff):
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return backoff * 2**attempt
+
+
+async def _fetch_one(session, limiter, semaphore, url, query, path, retries, backoff):
+    """Response of ``query``, from the cache at ``path`` or from the server."""
+    cached = _read_cache(path)
+    if cached is not None:
+        return cached
+
+    for attempt in range(retries + 1):
+        retry_after, error = None, None
+        async with semaphore:
+            await limiter.wait()
+            try:
+                async with session.post(url, data={"data": query}) as resp:
+                    if resp.status == 200:
+                        try:
+                            response = await resp.json(content_type=None)
+                        except ValueError:
+                            response = None
+                        # runtime errors (e.g. timeouts) are reported with a 200 and
+                        # a remark, overloaded servers may answer an HTML error page
+                        if not isinstance(response, dict):
+                            error = OverpassError("HTTP 200 without a JSON object")
+                        elif "remark" in response:
+                            error = OverpassError(response["remark"])
+                        else:
+                            _write_cache(path, response)
+                            return response
+                    elif resp.status in _RETRY_STATUS:
+                        retry_after = resp.headers.get("Retry-After")
+                        error = OverpassError(f"HTTP {resp.status}")
+                    else:
+                        raise OverpassError(
+                            f"HTTP {resp.status}: {await resp.text()}"
+                        )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+        if attempt < retries:
+            limiter.pause(_retry_delay(retry_after, attempt, backoff))
+
+    raise OverpassError(
+        f"Query failed after {retries + 1} attempts: {query}"
+    ) from error
+
+
+def _merge_responses(responses):
+    """Single response with every element of ``responses`` once, in order."""
+    seen = set()
+    elements = []
+    for response in responses:
+        for element in response.get("elements", []):
+            key = (element["type"], element["id"])
+            if key not in seen:
+                seen.add(key)
+                elements.append(element)
+    head = {k: v for k, v in responses[0].items() if k != "elements"}
+
+    return {**head, "elements": elements}
+
+
+async def fetch_overpass_async(
+    bbox,
+    custom_filter='["highway"]',
+    url=OVERPASS_URL,
+    cache_folder=CACHE_FOLDER,
+    max_query_area_size=MAX_QUERY_AREA_SIZE,
+    max_concurrency=2,
+    rate=1.0,
+    retries=5,
+    backoff=1.0,
+    timeout=180,
+):
+    """
+    Coroutine version of ``fetch_overpass``, to use within a running event loop.
+    """
+    if aiohttp is None:
+        raise ImportError("aiohttp is required to fetch from the Overpass API.")
+    os.makedirs(cache_folder, exist_ok=True)
+    queries = [
+        _overpass_query(cell, custom_filter, timeout)
+        for cell in _split_bbox(bbox, max_query_area_size)
+    ]
+
+    limiter = _RateLimiter(rate)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout + 30)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=client_timeout
+    ) as session:
+        responses = await asyncio.gather(
+            *(
+                _fetch_one(
+                    session,
+                    limiter,
+                    semaphore,
+                    url,
+                    query,
+                    os.path.join(cache_folder, f"{_cache_key(url, query)}.json"),
+                    retries,
+                    backoff,
+                )
+                for query in queries
+            )
+        )
+
+    return _merge_responses(responses)
+
+
+def fetch_overpass(bbox, path=None, **kwargs):
+    """
+    Fetches the street network within ``bbox`` from the Overpass API.
+
+    Parameters
+    ----------
+    bbox : tuple of float
+        west, south, east and north bounds in degrees
+    path : str (default None)
+        if set, the merged response is also written to ``path``
+    custom_filter : str (default '["highway"]')
+        Overpass filter of the ways, as ``osmnx``
+    url : str (default ``OVERPASS_URL``)
+        Overpass interpreter endpoint
+    cache_folder : str (default 'cache')
+        folder of the responses, looked up before querying and filled after
+    max_query_area_size : float (default 2.5e9)
+        largest area of a sub-query, in square meters
+    max_concurrency : int (default 2)
+        number of requests in flight (and of pooled connections)
+    rate : float (default 1.0)
+        maximum number of requests started per second, None for no limit
+    retries : int (default 5)
+        number of retries of a failed sub-query
+    backoff : float (default 1.0)
+        first delay in seconds before a retry, doubled at each attempt unless the
+        server sends ``Retry-After``
+    timeout : int (default 180)
+        server timeout of each sub-query, in seconds
+
+    Returns
+    -------
+    dict
+        Overpass response with the nodes and ways of all sub-queries, each once
+    """
+    response = asyncio.run(fetch_overpass_async(bbox, **kwargs))
+    if path is not None:
+        _write_cache(path, response)
+
+    return response
+
+
+class _StandInIndex:
+    """Nodes and ways of cached responses, queried by bounding box."""
+
+    def __init__(self, paths):
+        nodes, ways = {}, {}
+        for path in paths:
+            with open(path, "rb") as f:
+                # Nominatim responses stored in the cache are lists
+                if f.read(1) != b"{":
+                    continue
+            for element in _iter_elements(path):
+                store = nodes if element["type"] == "node" else ways
+                store.setdefault(element["id"], element)
+        self.nodes = nodes
+        self.ways = list(ways.values())
+        self.node_ids = np.fromiter(nodes, dtype=np.int64, count=len(nodes))
+        self.xy = np.array(
+            [(n["lon"], n["lat"]) for n in nodes.values()], dtype=float
+        ).reshape(-1, 2)
+        self.refs = [np.asarray(w.get("nodes", []), dtype=np.int64) for w in self.ways]
+
+    def query(self, bbox):
+        """Ways with a node in ``bbox`` and all their nodes, as ``(way(bbox);>;)``."""
+        west, south, east, north = bbox
+        x, y = self.xy[:, 0], self.xy[:, 1]
+        inside = self.node_ids[(x >= west) & (x <= east) & (y >= south) & (y <= north)]
+        ways = [
+            w for w, refs in zip(self.ways, self.refs) if np.isin(refs, inside).any()
+        ]
+        node_ids = dict.fromkeys(n for w in ways for n in w.get("nodes", []))
+
+        return ways + [self.nodes[n] for n in node_ids if n in self.nodes]
+
+
+# south, west, north, east of a bbox filter of an Overpass query
+_BBOX_PATTERN = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+
+
+def serve_cache(paths, host="127.0.0.1", port=0, fail_first=0, fail_status=429):
+    """
+    Starts a stand-in Overpass server answering the bounding box queries of
+    ``fetch_overpass`` from the cached responses in ``paths``, in a daemon thread.
+
+    Parameters
+    ----------
+    paths : list of str
+        cached Overpass responses
+    host, port : str, int (default '127.0.0.1', 0)
+        address to listen on, port 0 picks a free one
+    fail_first : int (default 0)
+        number of first requests answered with ``fail_status``, to exercise the
+        retries
+    fail_status : int (default 429)
+        status of the failed answers, sent with ``Retry-After: 0``. A 200 is sent
+        with a body that is not JSON, as servers reporting some errors do.
+
+    Returns
+    -------
+    tuple
+        the server, to ``shutdown`` when done, and its interpreter URL. The server
+        counts the requests it received in ``requests``.
+    """
+    index = _StandInIndex(paths)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _answer(self, query):
+            with lock:
+                self.server.requests += 1
+                failing = self.server.requests <= fail_first
+            match = _BBOX_PATTERN.search(query)
+            if failing and fail_status == 200:
+                body = b"<html><body>Dispatcher_Client::request_read_and_idx</body>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if failing or match is None:
+                self.send_response(fail_status if failing else 400)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            south, west, north, east = map(float, match.groups())
+            body = json.dumps(
+                {
+                    "version": 0.6,
+                    "generator": "Overpass stand-in",
+                    "elements": index.query((west, south, east, north)),
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode())
+            self._answer(form.get("data", [""])[0])
+
+        def do_GET(self):
+            self._answer(parse_qs(urlparse(self.path).query).get("data", [""])[0])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+
+    return server, f"http://{host}:{port}/api/interpreter"
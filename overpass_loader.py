@@ -0,0 +1,199 @@
+"""
+Direct loader of Overpass JSON responses (e.g. the ones in ``cache/``) into an edges
+GeoDataFrame, without building an OSMnx graph.
+
+Ways are split at intersections (nodes shared by several ways or repeated within a
+way) and at their ends, like ``osmnx.simplify_graph``, and every way segment is one
+undirected edge, as returned by ``osmnx.get_undirected``. The output is indexed by
+``(u, v, key)`` as ``osmnx.graph_to_gdfs`` and can be passed directly to
+``roundabout_simplification``.
+
+Responses are parsed incrementally with ``ijson`` when it is installed, otherwise
+with ``json``. Node coordinates are kept in arrays indexed by node id, projected in a
+single transform and edges are built with one ``pygeos.linestrings`` call.
+"""
+import json
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pygeos
+from pyproj import CRS, Transformer
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# way tags kept as edge attributes, as osmnx ``useful_tags_way``
+USEFUL_TAGS_WAY = [
+    "bridge",
+    "tunnel",
+    "oneway",
+    "lanes",
+    "ref",
+    "name",
+    "highway",
+    "maxspeed",
+    "service",
+    "access",
+    "area",
+    "landuse",
+    "width",
+    "est_width",
+    "junction",
+]
+
+
+def _iter_elements(path):
+    """Yields the elements of the Overpass response stored in ``path``."""
+    with open(path, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "elements.item", use_float=True)
+        else:
+            yield from json.load(f).get("elements", [])
+
+
+def _parse(paths, tags):
+    """
+    Node ids and coordinates, and the concatenated node references, ids and tags of
+    the ways found in ``paths``. Elements repeated across responses are kept once.
+    """
+    node_ids, lons, lats = [], [], []
+    way_ids, refs, way_sizes, way_tags = [], [], [], []
+    seen_ways = set()
+    for path in paths:
+        for element in _iter_elements(path):
+            if element["type"] == "node":
+                node_ids.append(element["id"])
+                lons.append(element["lon"])
+                lats.append(element["lat"])
+            elif element["type"] == "way" and element["id"] not in seen_ways:
+                seen_ways.add(element["id"])
+                nodes = element.get("nodes", [])
+                way_ids.append(element["id"])
+                refs.extend(nodes)
+                way_sizes.append(len(nodes))
+                way_tags.append(
+                    {k: v for k, v in element.get("tags", {}).items() if k in tags}
+                )
+
+    node_ids, first = np.unique(
+        np.asarray(node_ids, dtype=np.int64), return_index=True
+    )
+    xy = np.column_stack([np.asarray(lons)[first], np.asarray(lats)[first]])
+
+    return (
+        node_ids,
+        xy,
+        np.asarray(way_ids, dtype=np.int64),
+        np.asarray(refs, dtype=np.int64),
+        np.asarray(way_sizes, dtype=np.int64),
+        pd.DataFrame.from_records(way_tags, columns=tags),
+    )
+
+
+def _utm_crs(lon, lat):
+    """UTM CRS of the zone holding the mean of ``lon``, ``lat``."""
+    zone = int(np.floor((np.mean(lon) + 180) / 6) % 60) + 1
+    south = np.mean(lat) < 0
+
+    return CRS.from_epsg((32700 if south else 32600) + zone)
+
+
+def _split_ways(node_pos, way_of_ref):
+    """
+    Splits the ways (given by the node position of every reference and the way each
+    reference belongs to) at their ends and at the nodes referenced more than once.
+
+    Returns the reference position of the first and last node of every edge.
+    """
+    n = len(node_pos)
+    counts = np.bincount(node_pos)
+    new_way = np.ones(n, dtype=bool)
+    new_way[1:] = way_of_ref[1:] != way_of_ref[:-1]
+    end_way = np.ones(n, dtype=bool)
+    end_way[:-1] = new_way[1:]
+    split = np.flatnonzero(new_way | end_way | (counts[node_pos] > 1))
+
+    # consecutive split points of the same way delimit an edge
+    same_way = way_of_ref[split[1:]] == way_of_ref[split[:-1]]
+
+    return split[:-1][same_way], split[1:][same_way]
+
+
+def load_overpass_edges(paths, crs=None, tags=None):
+    """
+    Builds an edges GeoDataFrame from cached Overpass JSON responses.
+
+    Parameters
+    ----------
+    paths : str or list of str
+        Overpass responses (JSON with an ``elements`` list of nodes and ways)
+    crs : str, int or pyproj.CRS (default None)
+        CRS of the output. Defaults to the UTM zone of the network, as
+        ``osmnx.project_graph``.
+    tags : list of str (default None)
+        way tags kept as edge attributes. Defaults to ``USEFUL_TAGS_WAY``.
+
+    Returns
+    -------
+    GeoDataFrame
+        one LineString per undirected edge indexed by ``(u, v, key)`` with the
+        ``osmid`` of the way, its tags and the ``length`` in CRS units. Raises
+        ValueError if no way of the responses has at least two of their nodes.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    if tags is None:
+        tags = USEFUL_TAGS_WAY
+    node_ids, xy, way_ids, refs, way_sizes, way_tags = _parse(paths, tags)
+
+    # dropping references to nodes missing from the responses and ways left with
+    # less than two nodes
+    way_of_ref = np.repeat(np.arange(len(way_ids)), way_sizes)
+    node_pos = np.searchsorted(node_ids, refs)
+    node_pos[node_pos == len(node_ids)] = 0
+    found = node_ids[node_pos] == refs if len(node_ids) else np.zeros(len(refs), bool)
+    node_pos, way_of_ref = node_pos[found], way_of_ref[found]
+    valid_way = np.bincount(way_of_ref, minlength=len(way_ids)) > 1
+    keep = valid_way[way_of_ref]
+    node_pos, way_of_ref = node_pos[keep], way_of_ref[keep]
+    if not len(node_pos):
+        raise ValueError(
+            f"The Overpass responses {paths} have no way with at least two nodes."
+        )
+
+    if crs is None:
+        crs = _utm_crs(xy[:, 0], xy[:, 1])
+    transformer = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+    xy = np.column_stack(transformer.transform(xy[:, 0], xy[:, 1]))
+
+    starts, ends = _split_ways(node_pos, way_of_ref)
+    sizes = ends - starts + 1
+    offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(sizes)[:-1]]), sizes)
+    coord_pos = node_pos[np.arange(sizes.sum()) + offsets]
+    geoms = pygeos.linestrings(
+        xy[coord_pos], indices=np.repeat(np.arange(len(starts)), sizes)
+    )
+
+    u = node_ids[node_pos[starts]]
+    v = node_ids[node_pos[ends]]
+    # parallel edges between the same (unordered) pair of nodes get increasing keys
+    pair = pd.DataFrame({"a": np.minimum(u, v), "b": np.maximum(u, v)})
+    key = pair.groupby(["a", "b"]).cumcount().to_numpy()
+
+    edge_way = way_of_ref[starts]
+    edges = way_tags.iloc[edge_way].reset_index(drop=True)
+    edges.insert(0, "osmid", way_ids[edge_way])
+    if "oneway" in edges:
+        # same reading of the tag as osmnx
+        edges["oneway"] = edges.oneway.isin(["yes", "true", "1", "-1"])
+        if "junction" in edges:
+            edges["oneway"] |= edges.junction.eq("roundabout")
+    edges["length"] = pygeos.length(geoms)
+    edges.index = pd.MultiIndex.from_arrays([u, v, key], names=["u", "v", "key"])
+
+    return gpd.GeoDataFrame(
+        edges, geometry=gpd.GeoSeries(geoms, index=edges.index), crs=crs
+    )
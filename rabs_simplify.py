@@ -1,75 +1,437 @@
+import hashlib
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.ops import linemerge
-from shapely.geometry import Point
 from shapely.validation import make_valid
-from pygeos import multipolygons
+import pygeos
 
 import momepy as mm # outp
+from momepy import COINS, CircularCompactness
+from momepy.utils import GPD_10
+
+import metrics_cache
+from columnar import ColumnarEdges
+from incidence import PolygonEdgeIncidence
+from instrumentation import StageCollector, stage
+
+# version of the polygon metrics stored in the on-disk cache
+_METRICS_VERSION = 1
+
+# polygons of the last polygonized networks, keyed by content hash, with their
+# estimated size. Bounded in bytes, see ``set_polygonize_cache``.
+_POLYGONIZE_CACHE = OrderedDict()
+_POLYGONIZE_CACHE_MAX_BYTES = 256 * 2**20
+
+
+def set_polygonize_cache(max_bytes):
+    """
+    Sets the size limit, in bytes, of the in-process cache of polygonized networks
+    and evicts the least recently used entries above it. 0 disables the cache, e.g.
+    in worker processes that handle a different network every time.
+    """
+    global _POLYGONIZE_CACHE_MAX_BYTES
+    _POLYGONIZE_CACHE_MAX_BYTES = max_bytes
+    _evict_polygonize_cache()
+
+
+def _evict_polygonize_cache():
+    total = sum(nbytes for _, nbytes in _POLYGONIZE_CACHE.values())
+    while _POLYGONIZE_CACHE and total > _POLYGONIZE_CACHE_MAX_BYTES:
+        _, (_, nbytes) = _POLYGONIZE_CACHE.popitem(last=False)
+        total -= nbytes
 
-def _polygonize_ifnone(edges, polys):
+
+def _polys_nbytes(geoms):
+    """Rough memory size of pygeos geometries: their coordinates plus an overhead."""
+    return int(pygeos.get_num_coordinates(geoms).sum()) * 16 + len(geoms) * 100
+
+
+def _geometry_hash(geoms):
+    """
+    SHA-1 content hash of an array of pygeos geometries, from their coordinates and
+    vertex counts.
+    """
+    coords, idxs = pygeos.get_coordinates(geoms, return_index=True)
+    digest = hashlib.sha1(coords.tobytes())
+    digest.update(np.bincount(idxs, minlength=len(geoms)).tobytes())
+
+    return digest.hexdigest()
+
+
+def _polygonize_ifnone(edges, polys, node=False, cache=True):
+    """
+    Polygonizes ``edges`` if ``polys`` is None. If ``node`` is True, edges are noded
+    first (for networks where lines cross without sharing a vertex).
+
+    If ``cache`` is True, results are kept in an in-process LRU cache keyed by the
+    content hash of the edge geometries and bounded by ``set_polygonize_cache``, so
+    repeated runs on an unchanged network skip polygonization.
+    """
     if polys is None:
-        pre_polys = polygonize(edges.geometry)
-        polys = gpd.GeoDataFrame(geometry=[g for g in pre_polys], crs=edges.crs)
+        geoms = edges.geometry.values.data
+        cache = cache and _POLYGONIZE_CACHE_MAX_BYTES > 0
+        key = (_geometry_hash(geoms), node) if cache else None
+        if key in _POLYGONIZE_CACHE:
+            _POLYGONIZE_CACHE.move_to_end(key)
+            pre_polys = _POLYGONIZE_CACHE[key][0]
+        else:
+            if node:
+                geoms = pygeos.get_parts(pygeos.union_all(geoms))
+            pre_polys = pygeos.get_parts(pygeos.polygonize(geoms))
+            if cache:
+                _POLYGONIZE_CACHE[key] = (pre_polys, _polys_nbytes(pre_polys))
+                _evict_polygonize_cache()
+        polys = gpd.GeoDataFrame(
+            geometry=gpd.array.GeometryArray(pre_polys.copy()), crs=edges.crs
+        )
     return polys
 
 
+class SpatialIndexContext:
+    """
+    Spatial indexes of a network and of its polygons shared by the simplification
+    stages. Each STRtree is built once, on first use, and several predicates can be
+    answered from a single bulk candidate query.
+
+    The same context can be passed to several ``roundabout_simplification`` calls on
+    the same ``edges`` to avoid rebuilding the indexes (and polygonizing again).
+
+    Parameters
+    ----------
+    edges : GeoDataFrame
+        GeoDataFrame containing LineString geometry of urban network
+    polys : GeoDataFrame (default None)
+        GeoDataFrame containing Polygon geometry derived from polygonyzing
+        ``edges``. If None, ``edges`` are polygonized when first needed.
+    node : boolean (default False)
+        Node ``edges`` before polygonizing them. Only needed for networks where
+        lines cross without sharing a vertex.
+    cache_dir : str (default None)
+        Directory of a persistent cache of polygons and their metrics, keyed by the
+        content hash of ``edges`` (see ``metrics_cache``). Only used when ``polys``
+        is None.
+    cache_max_bytes : int (default 2**30)
+        Size limit of ``cache_dir``; least recently used entries are evicted.
+    polygonize_cache : boolean (default True)
+        Use the in-process cache of polygonized networks (see
+        ``set_polygonize_cache``). Disabled for parts of a network, such as tiles,
+        that are polygonized only once.
+    metrics : DataFrame (default None)
+        ``area`` and ``circom`` of ``polys``, if already computed.
+    """
+
+    def __init__(
+        self,
+        edges,
+        polys=None,
+        node=False,
+        cache_dir=None,
+        cache_max_bytes=2**30,
+        polygonize_cache=True,
+        metrics=None,
+    ):
+        self.edges = edges
+        self.node = node
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.polygonize_cache = polygonize_cache
+        self._polys = polys
+        self._metrics = metrics
+        self._edges_tree = None
+        self._polys_tree = None
+        self._incidence = None
+
+    @property
+    def polys(self):
+        if self._polys is None:
+            if self.cache_dir is None:
+                self._polys = _polygonize_ifnone(
+                    self.edges, None, node=self.node, cache=self.polygonize_cache
+                )
+            else:
+                self._polys, self._metrics = self._cached_polygon_metrics()
+        return self._polys
+
+    @property
+    def metrics(self):
+        """Area and circular compactness of ``polys``."""
+        if self._metrics is None:
+            self._metrics = _polygon_metrics(self.polys)
+        return self._metrics
+
+    def _cached_polygon_metrics(self):
+        key = metrics_cache.cache_key(
+            _geometry_hash(self.edges.geometry.values.data), self.node, _METRICS_VERSION
+        )
+        cached = metrics_cache.load_metrics(self.cache_dir, key)
+        if cached is not None:
+            geoms, columns = cached
+            polys = gpd.GeoDataFrame(
+                geometry=gpd.array.GeometryArray(geoms), crs=self.edges.crs
+            )
+            return polys, pd.DataFrame(columns, index=polys.index)
+
+        polys = _polygonize_ifnone(
+            self.edges, None, node=self.node, cache=self.polygonize_cache
+        )
+        metrics = _polygon_metrics(polys)
+        metrics_cache.save_metrics(
+            self.cache_dir,
+            key,
+            polys.geometry.values.data,
+            {c: metrics[c].to_numpy() for c in metrics.columns},
+            max_bytes=self.cache_max_bytes,
+        )
+        return polys, metrics
+
+    @property
+    def edges_tree(self):
+        if self._edges_tree is None:
+            self._edges_tree = pygeos.STRtree(self.edges.geometry.values.data)
+        return self._edges_tree
+
+    @property
+    def polys_tree(self):
+        if self._polys_tree is None:
+            self._polys_tree = pygeos.STRtree(self.polys.geometry.values.data)
+        return self._polys_tree
+
+    @property
+    def incidence(self):
+        """Sparse incidence of ``polys`` and the ``edges`` forming them."""
+        if self._incidence is None:
+            self._incidence = PolygonEdgeIncidence.from_sindex(self)
+        return self._incidence
+
+    def query_edges(self, geoms, predicates):
+        """
+        Pairs of positions (``geoms``, ``edges``) with intersecting bounding boxes
+        and a boolean mask per predicate, evaluated as ``edge <predicate> geom``.
+        """
+        return _query_predicates(
+            self.edges_tree, self.edges.geometry.values.data, geoms, predicates
+        )
+
+    def query_polys(self, geoms, predicates):
+        """
+        Pairs of positions (``geoms``, ``polys``) with intersecting bounding boxes
+        and a boolean mask per predicate, evaluated as ``poly <predicate> geom``.
+        """
+        return _query_predicates(
+            self.polys_tree, self.polys.geometry.values.data, geoms, predicates
+        )
+
+
+# predicate ``p`` such that ``a <predicate> b`` equals ``b <p> a``
+_CONVERSE = {
+    "contains": "within",
+    "covered_by": "covers",
+    "covers": "covered_by",
+    "crosses": "crosses",
+    "disjoint": "disjoint",
+    "intersects": "intersects",
+    "overlaps": "overlaps",
+    "touches": "touches",
+    "within": "contains",
+}
+
+
+def _query_predicates(tree, tree_geoms, geoms, predicates):
+    """
+    Single bulk bounding box query of ``geoms`` against ``tree``, followed by a
+    vectorized evaluation of each of ``predicates`` (pygeos predicate names) on the
+    candidate pairs, as ``tree_geom <predicate> geom``.
+
+    ``geoms`` (e.g. large roundabout multipolygons) are prepared once and passed as
+    the first argument of the converse predicate, as ``query_bulk(predicate=...)``
+    does, so each of them is not analysed again for every candidate.
+    """
+    geom_pos, tree_pos = tree.query_bulk(geoms)
+    pygeos.prepare(geoms)
+    masks = {
+        predicate: getattr(pygeos, _CONVERSE[predicate])(
+            geoms[geom_pos], tree_geoms[tree_pos]
+        )
+        for predicate in predicates
+    }
+
+    return geom_pos, tree_pos, masks
+
+
+def _polygon_metrics(polys):
+    """
+    Area and circular compactness of each polygon of ``polys``. Bump
+    ``_METRICS_VERSION`` when changing them so cached metrics are recomputed.
+    """
+    area = polys.geometry.area
+    circom = CircularCompactness(polys.assign(area=area), "area").series
+
+    return pd.DataFrame({"area": area, "circom": circom}, index=polys.index)
+
+
+def _pairwise_hausdorff(left, right):
+    """
+    Element-wise Hausdorff distance between two aligned geometry arrays, e.g. the
+    left and right geometries of a spatial join. Computed in a single vectorized
+    pygeos call instead of one shapely call per pair.
+    """
+    return pygeos.hausdorff_distance(left.data, right.data)
+
+
 def _selecting_rabs_from_poly(
-    gdf, circom_threshold=0.7, area_threshold=0.85, include_adjacent=True
+    gdf,
+    circom_threshold=0.7,
+    area_threshold=0.85,
+    include_adjacent=True,
+    area_threshold_val=None,
+    sindex=None,
+    stats=None,
+    adjacency="geometry",
+    max_forming_edges=3,
 ):
     """
     From a GeoDataFrame of polygons, returns a GDF of polygons that are
     above the Circular Compaactness threshold.
 
+    ``area_threshold_val`` overrides the area quantile computed from ``gdf``; used
+    when ``gdf`` is only a part of the network (e.g. a tile). ``sindex`` is a
+    ``SpatialIndexContext`` whose ``polys`` are ``gdf``. If ``stats`` (dict) is
+    passed, the number of candidates and adjacency pairs are recorded in it.
+    ``adjacency`` and ``max_forming_edges`` select how adjacent polygons are found
+    (see ``_rab_groups``).
+
     Return
     ________
     GeoDataFrames : round abouts and adjacent polygons
     """
     # calculate parameters
-    gdf = gdf.copy()
-    gdf["area"] = gdf.geometry.area
-    gdf["circom"] = CircularCompactness(gdf, "area").series
+    metrics = _polygon_metrics(gdf) if sindex is None else sindex.metrics
+    gdf = gdf[[gdf.geometry.name]].assign(
+        area=metrics["area"].to_numpy(), circom=metrics["circom"].to_numpy()
+    )
 
     # selecting round about polygons based on compactness
     rab = gdf[gdf.circom > circom_threshold]
     # exclude those above the area threshold
-    area_threshold_val = gdf.area.quantile(area_threshold)
+    if area_threshold_val is None:
+        area_threshold_val = gdf.area.quantile(area_threshold)
     rab = rab[rab.area < area_threshold_val]
+    if stats is not None:
+        stats["candidates"] = len(rab)
 
-    if include_adjacent is True:
-        # calculating some parameters
-        bounds = rab.geometry.bounds
-        rab = pd.concat([rab, bounds], axis=1)
-        rab["deltax"] = rab.maxx - rab.minx
-        rab["deltay"] = rab.maxy - rab.miny
-        rab["rab_diameter"] = rab[["deltax", "deltay"]].max(axis=1)
+    return _rab_groups(
+        gdf,
+        rab,
+        include_adjacent=include_adjacent,
+        sindex=sindex,
+        stats=stats,
+        adjacency=adjacency,
+        max_forming_edges=max_forming_edges,
+        area_threshold_val=area_threshold_val,
+    )
+
+
+def _rab_groups(
+    gdf,
+    rab,
+    include_adjacent=True,
+    sindex=None,
+    stats=None,
+    adjacency="geometry",
+    max_forming_edges=3,
+    area_threshold_val=None,
+):
+    """
+    From the polygons ``gdf`` (with an ``area`` column) and the roundabouts ``rab``
+    selected among them, returns the roundabouts and, if ``include_adjacent``, their
+    adjacent polygons, with the roundabout they belong to as ``index_right``.
+
+    With ``adjacency="geometry"`` adjacent polygons are the intersecting ones smaller
+    than the roundabout and within its diameter (Hausdorff distance). With
+    ``adjacency="topology"`` they are the polygons sharing an edge with the
+    roundabout and formed by at most ``max_forming_edges`` edges (triangle-like
+    slivers), below ``area_threshold_val`` if given, read from the sparse incidence
+    of ``sindex``.
+    """
+    if adjacency not in ("geometry", "topology"):
+        raise ValueError(
+            f"adjacency '{adjacency}' is not supported. Use 'geometry' or 'topology'."
+        )
+
+    if include_adjacent is True and adjacency == "topology":
+        if sindex is None or sindex.edges is None:
+            raise ValueError(
+                "Topology adjacency requires a SpatialIndexContext of the edges."
+            )
+        incidence = sindex.incidence
+        rab_positions = gdf.index.get_indexer(rab.index)
+        rab_pos, poly_pos = incidence.neighbours(rab_positions, k=1)
+        # the roundabout itself and its neighbours formed by few edges
+        keep = incidence.forming_edges()[poly_pos] <= max_forming_edges
+        if area_threshold_val is not None:
+            keep &= gdf["area"].to_numpy()[poly_pos] < area_threshold_val
+        keep |= poly_pos == rab_positions[rab_pos]
+        rab_pos, poly_pos = rab_pos[keep], poly_pos[keep]
+        order = np.lexsort((rab_pos, poly_pos))
+        rab_pos, poly_pos = rab_pos[order], poly_pos[order]
+        if stats is not None:
+            stats["adjacency_pairs"] = len(rab_pos)
+
+        index = gdf.index[poly_pos].rename("index")
+        geoms = gdf.geometry.values[poly_pos]
+        index_right = rab.index[rab_pos]
+
+    elif include_adjacent is True:
+        # diameter of each roundabout from its bounds
+        bounds = pygeos.bounds(rab.geometry.values.data)
+        rab_diameter = np.maximum(
+            bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]
+        )
 
         # selecting the adjacent areas that are of smaller than itself
-        if GPD_10:
-            rab_adj = gpd.sjoin(gdf, rab, predicate="intersects")
-        else:
-            rab_adj = gpd.sjoin(gdf, rab, op="intersects")
-        rab_adj = rab_adj[rab_adj.area_right >= rab_adj.area_left]
-        rab_adj.index.name = "index"
-        rab_adj["hdist"] = 0
+        if sindex is None:
+            sindex = SpatialIndexContext(None, polys=gdf)
+        rab_pos, poly_pos, masks = sindex.query_polys(
+            rab.geometry.values.data, ["intersects"]
+        )
+        intersects = masks["intersects"]
+        rab_pos, poly_pos = rab_pos[intersects], poly_pos[intersects]
+        smaller = rab["area"].to_numpy()[rab_pos] >= gdf["area"].to_numpy()[poly_pos]
+        rab_pos, poly_pos = rab_pos[smaller], poly_pos[smaller]
+        order = np.lexsort((rab_pos, poly_pos))
+        rab_pos, poly_pos = rab_pos[order], poly_pos[order]
+        if stats is not None:
+            stats["adjacency_pairs"] = len(rab_pos)
 
         # adding a hausdorff_distance threshold
-        # TODO: (should be a way to verctorize)
-        for i, group in rab_adj.groupby("index_right"):
-            for g in group.itertuples():
-                hdist = g.geometry.hausdorff_distance(rab.loc[i].geometry)
-                rab_adj.hdist.loc[g.Index] = hdist
+        hdist = _pairwise_hausdorff(
+            gdf.geometry.values[poly_pos], rab.geometry.values[rab_pos]
+        )
+        keep = hdist < rab_diameter[rab_pos]
+        rab_pos, poly_pos = rab_pos[keep], poly_pos[keep]
 
-        rab_plus = rab_adj[rab_adj.hdist < rab_adj.rab_diameter]
+        index = gdf.index[poly_pos].rename("index")
+        geoms = gdf.geometry.values[poly_pos]
+        index_right = rab.index[rab_pos]
 
     else:
-        rab["index_right"] = rab.index
-        rab_plus = rab
+        index = rab.index
+        geoms = rab.geometry.values
+        index_right = rab.index
 
-    # only keeping relevant fields
-    geom_col = rab_plus.geometry.name
-    rab_plus = rab_plus[[geom_col, "index_right"]]
+    # only keeping relevant fields, built from positions without copying the other
+    # polygon columns
+    geom_col = gdf.geometry.name
+    rab_plus = gpd.GeoDataFrame(
+        {geom_col: geoms, "index_right": np.asarray(index_right)},
+        geometry=geom_col,
+        index=index,
+        crs=gdf.crs,
+    )
 
     return rab_plus
 
@@ -80,21 +442,21 @@ def _rabs_center_points(gdf, center_type="centroid"):
     per round about with extra column with center_type.
     """
     # creating a multipolygon per RAB (as opposed to dissolving) of the entire
-    # composition of the RAB
-    # temporary DataFrame where geometry is the array of pygeos geometries
-    tmp = pd.DataFrame(gdf.copy())  # temporary hack until shapely 2.0 is out
-    tmp["geometry"] = tmp.geometry.values.data
-
-    pygeos_geoms = (
-        tmp.groupby("index_right")
-        .geometry.apply(pygeos.multipolygons)
-        .rename("geometry")
+    # composition of the RAB, all of them in a single call
+    labels, groups = np.unique(gdf.index_right.to_numpy(), return_inverse=True)
+    order = np.argsort(groups, kind="stable")
+    pygeos_geoms = pygeos.multipolygons(
+        gdf.geometry.values.data[order], indices=groups[order]
     )
-    pygeos_geoms = pygeos.make_valid(pygeos_geoms)
-
-    rab_multipolygons = gpd.GeoDataFrame(pygeos_geoms, crs=gdf.crs)
     # make_valid is transforming the multipolygons into geometry collections because of
     # shared edges
+    pygeos_geoms = pygeos.make_valid(pygeos_geoms)
+
+    rab_multipolygons = gpd.GeoDataFrame(
+        geometry=gpd.GeoSeries(
+            pygeos_geoms, index=pd.Index(labels, name="index_right"), crs=gdf.crs
+        )
+    )
 
     if center_type == "centroid":
         # geometry centroid of the actual circle
@@ -103,33 +465,52 @@ def _rabs_center_points(gdf, center_type="centroid"):
         ].geometry.centroid
 
     elif center_type == "mean":
+        # mean of the vertices of each RAB as grouped sums
         coords, idxs = pygeos.get_coordinates(pygeos_geoms, return_index=True)
-        means = {}
-        for i in np.unique(idxs):
-            tmps = coords[idxs == i]
-            target_idx = rab_multipolygons.index[i]
-            means[target_idx] = Point(tmps.mean(axis=0))
+        counts = np.bincount(idxs, minlength=len(labels))
+        means = np.column_stack(
+            [
+                np.bincount(idxs, weights=coords[:, 0], minlength=len(labels)),
+                np.bincount(idxs, weights=coords[:, 1], minlength=len(labels)),
+            ]
+        ) / counts[:, np.newaxis]
+        rab_multipolygons["center_pt"] = gpd.GeoSeries(
+            pygeos.points(means), index=rab_multipolygons.index, crs=gdf.crs
+        )
 
-        rab_multipolygons["center_pt"] = gpd.GeoSeries(means, crs=gdf.crs)
+    elif center_type == "mbc":
+        # center of the minimum bounding circle of each RAB
+        circles = pygeos.minimum_bounding_circle(pygeos_geoms)
+        rab_multipolygons["center_pt"] = gpd.GeoSeries(
+            pygeos.centroid(circles), index=rab_multipolygons.index, crs=gdf.crs
+        )
 
-    # centerpoint of minimum_bounding_circle
-    # minimun_bounding_circle() should be available in Shapely 2.0. Implementation still
-    # pending.
-    # current environment has 1.8.2
+    else:
+        raise ValueError(
+            f"center_type '{center_type}' is not supported. "
+            "Use 'centroid', 'mean' or 'mbc'."
+        )
 
     return rab_multipolygons
 
 
-def _coins_filtering_many_incoming(incoming_many, angle_threshold=0):
+def _coins_filtering_many_incoming(incoming_many, angle_threshold=0, batched=True):
     """
     Used only for the cases when more than one incoming line touches the
     roundabout.
+
+    If ``batched`` is True, COINS runs once over all the groups of lines sharing a
+    connector line (see ``_coins_batched_filtering``), otherwise once per group.
     """
+    if batched:
+        if incoming_many.empty:
+            return incoming_many
+        return _coins_batched_filtering(incoming_many, angle_threshold=angle_threshold)
+
     coins_filter_result = []
     # For each new connection, evaluate COINS and select the group from which the new
     # line belongs
-    # TODO ideally use the groupby object on line_wkt used earlier
-    for g, x in incoming_many.groupby("line_wkt"):
+    for g, x in incoming_many.groupby("line_key"):
         gs = gpd.GeoSeries(pd.concat([x.geometry, x.line]), crs=incoming_many.crs)
         gdf = gpd.GeoDataFrame(geometry=gs)
         gdf.drop_duplicates(inplace=True)
@@ -167,59 +548,195 @@ def _coins_filtering_many_incoming(incoming_many, angle_threshold=0):
     return incoming_many_reduced
 
 
-def _selecting_incoming_lines(rab_multipolygons, edges, angle_threshold=0):
+def _coins_batched_filtering(incoming_many, angle_threshold=0):
+    """
+    Runs COINS once over all the groups of ``incoming_many`` and keeps the incoming
+    lines that belong to the same stroke as the connector line of their group.
+
+    Each group (incoming lines plus their connector line) is moved to its own cell of
+    a grid so strokes never continue across groups. Strokes are mapped back to the
+    incoming lines by position, without spatial joins.
+    """
+    n = len(incoming_many)
+    keys = incoming_many.line_key.to_numpy()
+    # one connector line per group, after all the incoming lines
+    first = ~incoming_many.line_key.duplicated().to_numpy()
+    lines = gpd.GeoSeries(incoming_many.line).values.data[first]
+    geoms = np.concatenate([incoming_many.geometry.values.data, lines])
+    groups = np.unique(np.concatenate([keys, keys[first]]), return_inverse=True)[1]
+    groups = groups.ravel()
+
+    # duplicated geometries within a group are passed to COINS only once
+    geom_ids = pd.factorize(pygeos.to_wkb(geoms))[0]
+    _, unique_pos, inverse = np.unique(
+        np.column_stack([groups, geom_ids]),
+        axis=0,
+        return_index=True,
+        return_inverse=True,
+    )
+    inverse = inverse.ravel()
+    unique_geoms = geoms[unique_pos]
+    unique_groups = groups[unique_pos]
+
+    # moving each group around its connector end point to its own grid cell, anchors
+    # indexed by group rank as ``groups``
+    anchors = np.empty((len(lines), 2))
+    anchors[groups[n:]] = pygeos.get_coordinates(pygeos.get_point(lines, 0))
+    coords, idxs = pygeos.get_coordinates(unique_geoms, return_index=True)
+    coords_group = unique_groups[idxs]
+    coords = coords - anchors[coords_group]
+    cell = 2 * np.abs(coords).max() + 1
+    ncols = int(np.ceil(np.sqrt(len(anchors))))
+    cells = np.column_stack([coords_group % ncols, coords_group // ncols]) * cell
+    unique_geoms = pygeos.set_coordinates(unique_geoms.copy(), coords + cells)
+
+    coins = COINS(
+        gpd.GeoDataFrame(geometry=gpd.GeoSeries(unique_geoms)),
+        angle_threshold=angle_threshold,
+    )
+    strokes = coins.stroke_attribute().to_numpy()[inverse]
+
+    # stroke of the connector line of each group
+    line_strokes = np.empty(len(anchors), dtype=strokes.dtype)
+    line_strokes[groups[n:]] = strokes[n:]
+    keep = strokes[:n] == line_strokes[groups[:n]]
+
+    # same order as the per-group filtering
+    incoming_many_reduced = incoming_many[keep]
+    order = np.argsort(keys[keep], kind="stable")
+
+    return incoming_many_reduced.iloc[order]
+
+
+def _line_endpoints(geoms):
+    """
+    Coordinates of the first and last vertex of each LineString in a geometry array,
+    read from a single coordinate array instead of one shapely call per line.
+    """
+    coords, idxs = pygeos.get_coordinates(geoms.data, return_index=True)
+    ends = np.cumsum(np.bincount(idxs, minlength=len(geoms)))
+    starts = np.concatenate([[0], ends[:-1]])
+
+    return coords[starts], coords[ends - 1]
+
+
+def _connector_line_keys(end_xy, center_xy, tolerance=1e-6):
+    """
+    Integer key of each connector line from its quantized endpoint coordinates, with
+    the number of lines sharing it. Lines get the same key when all their endpoint
+    coordinates round to the same multiple of ``tolerance``; ends closer than
+    ``tolerance`` but on both sides of a rounding boundary get different keys.
+    """
+    quantized = np.round(np.hstack([end_xy, center_xy]) / tolerance).astype(np.int64)
+    _, keys, counts = np.unique(
+        quantized, axis=0, return_inverse=True, return_counts=True
+    )
+    keys = keys.ravel()
+
+    return keys, counts[keys]
+
+
+def _selecting_incoming_lines(
+    rab_multipolygons,
+    edges,
+    angle_threshold=0,
+    tolerance=1e-6,
+    sindex=None,
+    stats=None,
+):
     """Selecting only the lines that are touching but not covered by
     the ``rab_plus``.
     If more than one LineString is incoming to ``rab_plus``, COINS algorithm
     is used to select the line to be extended further.
+
+    Incoming lines are grouped by their connector line, compared on coordinates
+    quantized to ``tolerance``. ``sindex`` is a ``SpatialIndexContext`` of
+    ``edges``. If ``stats`` (dict) is passed, the number of touching and covered
+    edges, single and grouped incoming lines and COINS groups are recorded in it.
     """
-    # selecting the lines that are touching but not covered by
-    if GPD_10:
-        touching = gpd.sjoin(edges, rab_multipolygons, predicate="touches")
-    else:
-        touching = gpd.sjoin(edges, rab_multipolygons, op="touches")
+    # selecting the lines that are touching but not covered by, both predicates from
+    # the same candidate pairs
+    if sindex is None:
+        sindex = SpatialIndexContext(edges)
+    rab_pos, edge_pos, masks = sindex.query_edges(
+        rab_multipolygons.geometry.values.data, ["touches", "covered_by"]
+    )
+
+    return _incoming_from_pairs(
+        rab_multipolygons,
+        edges,
+        rab_pos,
+        edge_pos,
+        masks,
+        angle_threshold=angle_threshold,
+        tolerance=tolerance,
+        stats=stats,
+    )
 
-    if GPD_10:
-        idx_drop = gpd.sjoin(edges, rab_multipolygons, predicate="covered_by").index
-    else:
-        idx_drop = gpd.sjoin(edges, rab_multipolygons, op="covered_by").index
 
-    touching_idx = touching.index
-    ls = list(set(touching_idx) - set(idx_drop))
+def _incoming_from_pairs(
+    rab_multipolygons,
+    edges,
+    rab_pos,
+    edge_pos,
+    masks,
+    angle_threshold=0,
+    tolerance=1e-6,
+    stats=None,
+):
+    """
+    Second part of ``_selecting_incoming_lines``, from the candidate pairs of
+    roundabouts and edges and their ``touches`` and ``covered_by`` masks. Lets
+    callers reuse the pairs of a superset of roundabouts.
+    """
+    covered = np.unique(edge_pos[masks["covered_by"]])
+    idx_drop = edges.index[covered]
 
-    incoming = touching.loc[ls]
+    touching = masks["touches"] & ~np.isin(edge_pos, covered)
+    order = np.lexsort((rab_pos[touching], edge_pos[touching]))
+    rab_pos, edge_pos = rab_pos[touching][order], edge_pos[touching][order]
+
+    # only the geometry and the roundabout of the incoming edges are carried, the
+    # edge attributes are kept in ``edges`` until the output is built
+    incoming = gpd.GeoDataFrame(
+        {"index_right": rab_multipolygons.index[rab_pos]},
+        geometry=edges.geometry.values[edge_pos],
+        index=edges.index[edge_pos],
+        crs=edges.crs,
+    )
 
     # figuring out which ends of incoming edges needs to be connected to the center_pt
-    incoming["first_pt"] = incoming.geometry.apply(lambda x: Point(x.coords[0]))
-    incoming["dist_fisrt_pt"] = incoming.center_pt.distance(incoming.first_pt)
-    incoming["last_pt"] = incoming.geometry.apply(lambda x: Point(x.coords[-1]))
-    incoming["dist_last_pt"] = incoming.center_pt.distance(incoming.last_pt)
-    lines = []
-    for i, row in incoming.iterrows():
-        if row.dist_fisrt_pt < row.dist_last_pt:
-            lines.append(LineString([row.first_pt, row.center_pt]))
-        else:
-            lines.append(LineString([row.last_pt, row.center_pt]))
+    first_xy, last_xy = _line_endpoints(incoming.geometry.values)
+    center_xy = pygeos.get_coordinates(
+        gpd.GeoSeries(rab_multipolygons.center_pt).values.data
+    )[rab_pos]
+    # same arithmetic as GEOS point distance so ties resolve as before
+    dist_first = np.sqrt(((first_xy - center_xy) ** 2).sum(axis=1))
+    dist_last = np.sqrt(((last_xy - center_xy) ** 2).sum(axis=1))
+    end_xy = np.where((dist_first < dist_last)[:, np.newaxis], first_xy, last_xy)
+    lines = pygeos.linestrings(np.stack([end_xy, center_xy], axis=1))
     incoming["line"] = gpd.GeoSeries(lines, index=incoming.index, crs=edges.crs)
 
     # checking in there are more than one incoming lines arriving to the same point
     # which would create several new lines
-    incoming["line_wkt"] = incoming.line.to_wkt()
-    grouped_lines = incoming.groupby(["line_wkt"])["line_wkt"]
-    count_s = grouped_lines.count()
+    line_key, line_count = _connector_line_keys(end_xy, center_xy, tolerance)
+    incoming["line_key"] = line_key
 
     # separating the incoming roads that come on their own to those that come in groups
-    filter_count_one = pd.DataFrame(count_s[count_s == 1])
-    filter_count_many = pd.DataFrame(count_s[count_s > 1])
-    incoming_ones = pd.merge(
-        incoming, filter_count_one, left_on="line_wkt", right_index=True, how="inner"
-    )
-    incoming_many = pd.merge(
-        incoming, filter_count_many, left_on="line_wkt", right_index=True, how="inner"
-    )
+    incoming_ones = incoming[line_count == 1]
+    incoming_many = incoming[line_count > 1]
     incoming_many_reduced = _coins_filtering_many_incoming(
         incoming_many, angle_threshold=angle_threshold
     )
+    if stats is not None:
+        stats.update(
+            touching_edges=len(incoming),
+            covered_edges=len(idx_drop),
+            single_incoming=len(incoming_ones),
+            grouped_incoming=len(incoming_many),
+            coins_groups=incoming_many.line_key.nunique(),
+            coins_kept=len(incoming_many_reduced),
+        )
 
     incoming_all = gpd.GeoDataFrame(
         pd.concat([incoming_ones, incoming_many_reduced]), crs=edges.crs
@@ -228,31 +745,375 @@ def _selecting_incoming_lines(rab_multipolygons, edges, angle_threshold=0):
     return incoming_all, idx_drop
 
 
+def _extend_to_centers(geoms, pos, lines):
+    """
+    Extends the LineStrings at positions ``pos`` of ``geoms`` with the last vertex of
+    their connector line in ``lines``, on the end the connector line starts from.
+    ``pos`` may repeat when an edge is extended at both ends. All the extended
+    LineStrings are rebuilt in one ``pygeos.linestrings`` call, without line merging.
+
+    Returns the extended positions and their new geometries.
+    """
+    ext_pos, owner = np.unique(pos, return_inverse=True)
+    owner = owner.ravel()
+    coords, idxs = pygeos.get_coordinates(geoms[ext_pos].data, return_index=True)
+    counts = np.bincount(idxs, minlength=len(ext_pos))
+    first_xy = coords[np.cumsum(counts) - counts]
+    line_start, line_end = _line_endpoints(lines)
+    at_start = (line_start == first_xy[owner]).all(axis=1)
+
+    # new vertices go before the first or after the last vertex of their LineString
+    order = np.concatenate(
+        [np.arange(len(coords)), np.where(at_start, -1, len(coords))]
+    )
+    owners = np.concatenate([idxs, owner])
+    sort = np.lexsort((order, owners))
+    xy = np.concatenate([coords, line_end])[sort]
+
+    return ext_pos, pygeos.linestrings(xy, indices=owners[sort])
+
+
 def _ext_lines_to_center(edges, incoming_all, idx_out):
     """
     Extends the Linestrings geometrie to the centerpoint defined by
     _rabs_center_points. Also deleted the lines that originally defined the roundabout.
 
+    Incoming edges are updated in their own row: only the extended geometries are
+    written, by position, into the geometry column of the output.
+
     Returns
     -------
     GeoDataFrame
         GeoDataFrame of with updated geometry
     """
-    # this can most likely be vectorized with pygeos.line_merge()!! #TODO
-    incoming_all["geometry"] = incoming_all.apply(
-        lambda row: linemerge([row.geometry, row.line]), axis=1
-    )
+    # incoming edges must be rows of the output, get_indexer would return -1
+    missing = ~incoming_all.index.isin(edges.index) | incoming_all.index.isin(idx_out)
+    if missing.any():
+        raise ValueError(
+            "Incoming edges must be in `edges` and not among the dropped edges: "
+            f"{list(incoming_all.index[missing][:5])}"
+        )
 
-    # deleting the original round about edges
-    new_edges = edges.drop(idx_out, axis=0)
+    # deleting the original round about edges, the output owns its arrays
+    if len(idx_out):
+        new_edges = edges.drop(idx_out, axis=0)
+    else:
+        new_edges = edges.copy()
 
-    # mantianing the same gdf shape that the original
-    incoming_all = incoming_all[edges.columns]
-    new_edges = pd.concat([new_edges, incoming_all])
+    if incoming_all.empty:
+        return new_edges
+
+    # overwriting only the geometry of the incoming edges by the extended one
+    ext_pos, ext_geoms = _extend_to_centers(
+        new_edges.geometry.values,
+        new_edges.index.get_indexer(incoming_all.index),
+        gpd.GeoSeries(incoming_all.line).values,
+    )
+    new_edges.iloc[ext_pos, new_edges.columns.get_loc(new_edges.geometry.name)] = (
+        gpd.array.GeometryArray(ext_geoms, crs=new_edges.crs)
+    )
 
     return new_edges
 
 
+def _tile_grid(total_bounds, tile_size):
+    """
+    Regular grid covering ``total_bounds``. Returns the grid origin, the number of
+    columns and rows, and the (col, row) of every tile.
+    """
+    minx, miny, maxx, maxy = total_bounds
+    ncols = max(int(np.ceil((maxx - minx) / tile_size)), 1)
+    nrows = max(int(np.ceil((maxy - miny) / tile_size)), 1)
+    cols, rows = np.meshgrid(np.arange(ncols), np.arange(nrows))
+    tiles = np.column_stack([cols.ravel(), rows.ravel()])
+
+    return (minx, miny), (ncols, nrows), tiles
+
+
+def _tile_owner(xy, origin, tile_size, shape):
+    """
+    (col, row) of the tile owning each point of the (n, 2) array ``xy``. Tiles are
+    half-open so every point has exactly one owner; points on the outer border
+    belong to the last column/row.
+    """
+    cols = np.clip(np.floor((xy[:, 0] - origin[0]) / tile_size), 0, shape[0] - 1)
+    rows = np.clip(np.floor((xy[:, 1] - origin[1]) / tile_size), 0, shape[1] - 1)
+
+    return np.column_stack([cols, rows]).astype(int)
+
+
+def _tile_polygons(args):
+    """
+    First tiled pass: polygonizes the edges of a tile (plus halo). Returns the area,
+    circular compactness and diameter of the polygons owned by the tile, and all the
+    polygons of the tile with their metrics, reused by the second pass.
+    """
+    tile_edges, tile, origin, tile_size, shape = args
+    polys = _polygonize_ifnone(tile_edges, None, cache=False)
+    metrics = _polygon_metrics(polys)
+    geoms = polys.geometry.values.data
+    owned = (
+        _tile_owner(
+            pygeos.get_coordinates(pygeos.point_on_surface(geoms)),
+            origin,
+            tile_size,
+            shape,
+        )
+        == tile
+    ).all(axis=1)
+    bounds = pygeos.bounds(geoms[owned]).reshape(-1, 4)
+    diameter = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    stats = (
+        metrics.area.to_numpy()[owned],
+        metrics.circom.to_numpy()[owned],
+        diameter,
+    )
+
+    return stats, (polys, metrics)
+
+
+def _tile_polygon_stats(args):
+    """
+    Statistics of ``_tile_polygons`` only, for callers that do not keep the
+    polygons between passes.
+    """
+    return _tile_polygons(args)[0]
+
+
+def _global_area_threshold(stats, area_threshold, circom_threshold):
+    """
+    Combines the per-tile output of ``_tile_polygon_stats``. Returns the global area
+    quantile (NaN, selecting no roundabout, if there is no polygon), the diameter of
+    the largest roundabout candidate and the diameter of the largest block (0 if
+    none).
+    """
+    if not any(len(s[0]) for s in stats):
+        return np.nan, 0, 0
+    area, circom, diameter = (np.concatenate(s) for s in zip(*stats))
+    area_threshold_val = np.quantile(area, area_threshold)
+    candidates = (circom > circom_threshold) & (area < area_threshold_val)
+    max_diameter = diameter[candidates].max() if candidates.any() else 0
+    max_block = diameter.max() if len(diameter) else 0
+
+    return area_threshold_val, max_diameter, max_block
+
+
+def _check_halo(halo, max_diameter, max_block, name="tile_halo", stacklevel=3):
+    """
+    Warns when ``halo`` may be too narrow for the output to match the single-process
+    one: smaller than twice the largest roundabout, or than the largest block.
+    Blocks that close in no tile are not seen, so a block larger than the halo is
+    taken as a sign that others may be missing from the area quantile.
+    """
+    if 2 * max_diameter > halo:
+        warnings.warn(
+            f"{name} ({halo}) is smaller than twice the diameter of the largest "
+            f"roundabout ({max_diameter}). Results may differ from the "
+            "single-process simplification.",
+            UserWarning,
+            stacklevel=stacklevel,
+        )
+    if max_block > halo:
+        warnings.warn(
+            f"{name} ({halo}) is smaller than the diameter of the largest block "
+            f"({max_block}). Blocks that do not close in their tile are missing from "
+            "the area quantile and results may differ from the single-process "
+            "simplification.",
+            UserWarning,
+            stacklevel=stacklevel,
+        )
+
+
+def _tile_simplification(args):
+    """
+    Second tiled pass: selects the roundabouts owned by a tile (plus halo), from the
+    polygons of the first pass, and their candidate pairs with the edges. Returns
+    the roundabout multipolygons, the position of the roundabout and of the edge (in
+    the whole network, from ``positions``) of each pair and the ``touches`` and
+    ``covered_by`` masks, or None if the tile owns no roundabout.
+    """
+    (
+        tile_edges,
+        positions,
+        (polys, metrics),
+        tile,
+        origin,
+        tile_size,
+        shape,
+        area_threshold_val,
+        circom_threshold,
+        include_adjacent,
+        center_type,
+    ) = args
+    sindex = SpatialIndexContext(tile_edges, polys=polys, metrics=metrics)
+    rab = _selecting_rabs_from_poly(
+        polys,
+        circom_threshold=circom_threshold,
+        include_adjacent=include_adjacent,
+        area_threshold_val=area_threshold_val,
+        sindex=sindex,
+    )
+    # a roundabout belongs to the tile holding its main polygon, the ones in the halo
+    # are processed by their own tile
+    rab_idx = rab.index_right.unique()
+    owned = (
+        _tile_owner(
+            pygeos.get_coordinates(
+                pygeos.point_on_surface(polys.geometry.loc[rab_idx].values.data)
+            ),
+            origin,
+            tile_size,
+            shape,
+        )
+        == tile
+    ).all(axis=1)
+    rab = rab[rab.index_right.isin(rab_idx[owned])]
+    if rab.empty:
+        return None
+
+    rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
+    # incoming lines are selected once the tiles are stitched, an edge touching this
+    # roundabout may be covered by the roundabout of another tile
+    rab_pos, edge_pos, masks = sindex.query_edges(
+        rab_multipolygons.geometry.values.data, ["touches", "covered_by"]
+    )
+
+    return rab_multipolygons, rab_pos, positions[edge_pos], masks
+
+
+def _tiled_roundabout_simplification(
+    edges,
+    tile_size,
+    tile_halo=None,
+    n_jobs=None,
+    circom_threshold=0.7,
+    area_threshold=0.85,
+    include_adjacent=True,
+    center_type="centroid",
+    angle_threshold=0,
+):
+    """
+    Tiled execution of ``roundabout_simplification``. Each tile (extended by
+    ``tile_halo``) is processed in a separate process and the results are stitched
+    together. Every roundabout is owned by exactly one tile so results are not
+    duplicated.
+
+    The area quantile used to discard urban blocks is computed globally from the
+    polygons owned by each tile in a first pass. The candidate pairs of roundabouts
+    and edges of all the tiles are then stitched and the incoming lines (including
+    COINS) selected on them at once, as in a single run. The output matches the
+    single-process one as long as ``tile_halo`` is wide enough to close every block
+    and hold every roundabout with its adjacent polygons. A block that closes in no
+    tile cannot be detected; a warning is raised when the largest block found is
+    wider than ``tile_halo``.
+
+    Each tile is polygonized once: its polygons and metrics are returned by the
+    first pass and handed back to the second. Only polygonization, metrics and the
+    selection of roundabouts run in the pool. The parent runs the rest serially on
+    the whole network, which bounds the speed-up with more cores:
+
+    - the spatial query assigning edges to tiles
+    - the selection of incoming lines on the stitched pairs, including COINS, which
+      needs every tile as an edge covered in one tile changes the incoming lines of
+      a roundabout of another
+    - the extension of the incoming lines and the removal of the roundabout edges
+
+    These steps are vectorized and usually much cheaper than polygonization, which
+    dominates on large networks. The polygons of all tiles are held by the parent
+    between the passes.
+    """
+    if tile_halo is None:
+        tile_halo = tile_size / 4
+
+    origin, shape, tiles = _tile_grid(edges.total_bounds, tile_size)
+    x0 = origin[0] + tiles[:, 0] * tile_size - tile_halo
+    y0 = origin[1] + tiles[:, 1] * tile_size - tile_halo
+    width = tile_size + 2 * tile_halo
+    boxes = pygeos.box(x0, y0, x0 + width, y0 + width)
+    # pairs come sorted by tile, empty tiles are skipped
+    tile_pos, edge_pos = edges.sindex.query_bulk(boxes, predicate="intersects")
+    tile_ids, starts = np.unique(tile_pos, return_index=True)
+    # tiles only carry the geometry, attributes stay in ``edges``
+    geometry = edges[[edges.geometry.name]]
+    tile_edges = [
+        (geometry.iloc[pos], pos, tiles[t])
+        for t, pos in zip(tile_ids, np.split(edge_pos, starts[1:]))
+    ]
+
+    if n_jobs == 1:
+        executor = None
+        map_ = map
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_jobs)
+        map_ = executor.map
+
+    try:
+        # global area threshold and halo check, the polygons of each tile are
+        # kept for the second pass instead of polygonizing the tile again
+        stats, tile_polys = zip(
+            *map_(
+                _tile_polygons,
+                [(e, t, origin, tile_size, shape) for e, _, t in tile_edges],
+            )
+        )
+        area_threshold_val, max_diameter, max_block = _global_area_threshold(
+            stats, area_threshold, circom_threshold
+        )
+        _check_halo(tile_halo, max_diameter, max_block, stacklevel=4)
+
+        results = list(
+            map_(
+                _tile_simplification,
+                [
+                    (
+                        e,
+                        pos,
+                        p,
+                        t,
+                        origin,
+                        tile_size,
+                        shape,
+                        area_threshold_val,
+                        circom_threshold,
+                        include_adjacent,
+                        center_type,
+                    )
+                    for (e, pos, t), p in zip(tile_edges, tile_polys)
+                ],
+            )
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results = [r for r in results if r is not None]
+    if not results:
+        return edges.copy()
+
+    # stitching the pairs of every tile, roundabouts are relabelled as their labels
+    # are polygon labels local to each tile
+    offsets = np.cumsum([0] + [len(r[0]) for r in results[:-1]])
+    rab_multipolygons = gpd.GeoDataFrame(
+        pd.concat([r[0] for r in results], ignore_index=True), crs=edges.crs
+    )
+    rab_pos = np.concatenate([r[1] + o for r, o in zip(results, offsets)])
+    edge_pos = np.concatenate([r[2] for r in results])
+    masks = {
+        p: np.concatenate([r[3][p] for r in results])
+        for p in ("touches", "covered_by")
+    }
+    incoming_all, idx_drop = _incoming_from_pairs(
+        rab_multipolygons,
+        edges,
+        rab_pos,
+        edge_pos,
+        masks,
+        angle_threshold=angle_threshold,
+    )
+
+    return _ext_lines_to_center(edges, incoming_all, idx_drop)
+
+
 def roundabout_simplification(
     edges,
     polys=None,
@@ -261,6 +1122,15 @@ def roundabout_simplification(
     include_adjacent=True,
     center_type="centroid",
     angle_threshold=0,
+    tile_size=None,
+    tile_halo=None,
+    n_jobs=None,
+    sindex=None,
+    collector=None,
+    adjacency="geometry",
+    max_forming_edges=3,
+    columnar=False,
+    cache_dir=None,
 ):
     """
     Selects the roundabouts from ``polys`` to create a center point to merge all
@@ -298,11 +1168,13 @@ def roundabout_simplification(
         Adjacent polygons to be considered also as part of the simplification.
     center_type : string (default 'centroid')
         Method to use for converging the incoming LineStrings.
-        Current list of options available : 'centroid', 'mean'.
+        Current list of options available : 'centroid', 'mean', 'mbc'.
         - 'centroid': selects the centroid of the actual roundabout (ignoring adjacent
         geometries)
         - 'mean': calculates the mean coordinates from the points of polygons (including
          adjacent geometries)
+        - 'mbc': center of the minimum bounding circle of the polygons (including
+         adjacent geometries)
     angle_threshold : int, float (default 0)
         The angle threshold for the COINS algorithm. Only used when multiple incoming
         LineStrings
@@ -314,23 +1186,312 @@ def roundabout_simplification(
         Segments will only be considered a part of the same street if the deflection
         angle
         is above the threshold.
+    tile_size : float (default None)
+        If set, ``edges`` are split into square tiles of this size (in CRS units)
+        processed in parallel. Useful for networks too large to polygonize at once.
+        Each roundabout is simplified by the tile containing it, so results are not
+        duplicated across tiles. Polygonization and roundabout selection run in
+        parallel; incoming lines are selected and extended serially on the whole
+        network. Not compatible with ``polys``.
+    tile_halo : float (default None)
+        Buffer around each tile (in CRS units) whose edges are also loaded. Should be
+        wider than any urban block and twice the largest roundabout with its adjacent
+        polygons, otherwise blocks that do not close in their tile change the area
+        quantile. A warning is raised when the largest roundabout or block found is
+        too wide. Defaults to a quarter of ``tile_size``.
+    n_jobs : int (default None)
+        Number of processes used when ``tile_size`` is set. None uses all available
+        cores, 1 runs the tiles sequentially.
+    sindex : SpatialIndexContext (default None)
+        Spatial indexes (and polygons) of ``edges`` built by a previous call or by
+        the caller. Reusing it across calls on the same ``edges`` avoids
+        polygonizing and indexing the network again. Not compatible with ``polys``
+        and no longer valid once ``edges`` are modified.
+    collector : StageCollector or callable (default None)
+        Records elapsed time, peak memory and cardinalities of each stage
+        ('polygonize', 'selecting_rabs', 'center_points', 'incoming_lines',
+        'ext_lines'). A callable is wrapped in a ``StageCollector`` and called with
+        every stage record. Not compatible with ``tile_size``.
+    adjacency : string (default 'geometry')
+        How adjacent polygons are selected when ``include_adjacent`` is True.
+        - 'geometry': intersecting polygons smaller than the roundabout and within
+        its diameter (Hausdorff distance)
+        - 'topology': polygons sharing an edge with the roundabout and formed by at
+        most ``max_forming_edges`` edges, which also catches triangle-like slivers
+        larger than the roundabout. Uses the sparse polygon-edge incidence of
+        ``sindex``. Not compatible with ``tile_size``.
+    max_forming_edges : int (default 3)
+        Maximum number of forming edges of an adjacent polygon with
+        ``adjacency='topology'``.
+    columnar : boolean (default False)
+        If True, the result is returned as ``ColumnarEdges`` (coordinates, offsets
+        and attributes in contiguous buffers), to share with worker processes
+        through shared memory or a memory-mapped file. Attribute dtypes are kept;
+        a ValueError is raised for those that cannot be stored without loss.
+    cache_dir : str (default None)
+        Directory of a persistent cache of the polygons of ``edges`` and their
+        metrics (see ``SpatialIndexContext``), so later calls on the same network
+        skip polygonizing. Not compatible with ``polys``, ``sindex`` or
+        ``tile_size``.
 
     Returns
     -------
-    GeoDataFrame
+    GeoDataFrame or ColumnarEdges
         GeoDataFrame with an updated geometry
     """
-    polys = _polygonize_ifnone(edges, polys)
-    rab = _selecting_rabs_from_poly(
-        polys,
-        circom_threshold=circom_threshold,
-        area_threshold=area_threshold,
-        include_adjacent=include_adjacent,
-    )
-    rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
-    incoming_all, idx_drop = _selecting_incoming_lines(
-        rab_multipolygons, edges, angle_threshold=angle_threshold
-    )
-    output = _ext_lines_to_center(edges, incoming_all, idx_drop)
+    if tile_size is not None:
+        if any(a is not None for a in (polys, sindex, collector, cache_dir)):
+            raise ValueError(
+                "Tiled simplification does not support passing `polys`, `sindex`, "
+                "`collector` or `cache_dir`."
+            )
+        if adjacency != "geometry":
+            raise ValueError("Tiled simplification only supports geometry adjacency.")
+        output = _tiled_roundabout_simplification(
+            edges,
+            tile_size,
+            tile_halo=tile_halo,
+            n_jobs=n_jobs,
+            circom_threshold=circom_threshold,
+            area_threshold=area_threshold,
+            include_adjacent=include_adjacent,
+            center_type=center_type,
+            angle_threshold=angle_threshold,
+        )
+        if columnar:
+            return ColumnarEdges.from_geodataframe(output)
+        return output
 
+    if collector is not None and not isinstance(collector, StageCollector):
+        collector = StageCollector(callback=collector)
+    if sindex is None:
+        if polys is not None and cache_dir is not None:
+            raise ValueError("`polys` and `cache_dir` cannot be passed together.")
+        sindex = SpatialIndexContext(edges, polys, cache_dir=cache_dir)
+    elif polys is not None:
+        raise ValueError("`polys` and `sindex` cannot be passed together.")
+    elif cache_dir is not None:
+        raise ValueError("`cache_dir` and `sindex` cannot be passed together.")
+
+    with stage(collector, "polygonize") as record:
+        polys = sindex.polys
+        if record is not None:
+            record["polygons"] = len(polys)
+    with stage(collector, "selecting_rabs") as record:
+        rab = _selecting_rabs_from_poly(
+            polys,
+            circom_threshold=circom_threshold,
+            area_threshold=area_threshold,
+            include_adjacent=include_adjacent,
+            sindex=sindex,
+            stats=record,
+            adjacency=adjacency,
+            max_forming_edges=max_forming_edges,
+        )
+        if record is not None:
+            record["rab_polygons"] = len(rab)
+    with stage(collector, "center_points") as record:
+        rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
+        if record is not None:
+            record["roundabouts"] = len(rab_multipolygons)
+    with stage(collector, "incoming_lines") as record:
+        incoming_all, idx_drop = _selecting_incoming_lines(
+            rab_multipolygons,
+            edges,
+            angle_threshold=angle_threshold,
+            sindex=sindex,
+            stats=record,
+        )
+    with stage(collector, "ext_lines") as record:
+        output = _ext_lines_to_center(edges, incoming_all, idx_drop)
+        if record is not None:
+            record["extended_edges"] = len(incoming_all)
+            record["dropped_edges"] = len(idx_drop)
+
+    if columnar:
+        return ColumnarEdges.from_geodataframe(output)
     return output
+
+
+class _StageParameter:
+    """
+    Parameter of a ``RoundaboutSimplifier``. Setting it to a new value invalidates
+    ``stage`` and every stage after it.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj._params[self.name]
+
+    def __set__(self, obj, value):
+        if self.name not in obj._params or obj._params[self.name] != value:
+            obj._params[self.name] = value
+            obj._invalidate(self.stage)
+
+
+class RoundaboutSimplifier:
+    """
+    Stage by stage version of ``roundabout_simplification``. Each stage is computed
+    on first access and kept until a parameter it depends on changes:
+
+    - ``polys``: polygons of ``edges``
+    - ``roundabouts``: roundabouts and adjacent polygons, with the roundabout they
+      belong to as ``index_right`` (``circom_threshold``, ``area_threshold``,
+      ``include_adjacent``, ``adjacency``, ``max_forming_edges``)
+    - ``centers``: one multipolygon and center point per roundabout
+      (``center_type``)
+    - ``incoming``: incoming lines to extend and indices of the edges to drop
+      (``angle_threshold``)
+    - ``output``: simplified edges
+
+    Setting a parameter only recomputes the stages from the first one depending on
+    it, e.g. changing ``angle_threshold`` reruns the COINS filtering and the line
+    extension but reuses the roundabouts and their spatial queries.
+
+    Parameters
+    ----------
+    edges : GeoDataFrame
+        GeoDataFrame containing LineString geometry of urban network
+    polys : GeoDataFrame (default None)
+        see ``roundabout_simplification``
+    sindex : SpatialIndexContext (default None)
+        see ``roundabout_simplification``
+    circom_threshold, area_threshold, include_adjacent, center_type, angle_threshold
+        see ``roundabout_simplification``
+    adjacency, max_forming_edges
+        see ``roundabout_simplification``
+
+    Examples
+    --------
+    >>> simplifier = RoundaboutSimplifier(edges)
+    >>> candidates = simplifier.detect()
+    >>> simplified = simplifier.output
+    >>> simplifier.angle_threshold = 30
+    >>> simplified_30 = simplifier.output
+    """
+
+    # stages in order of dependency
+    _STAGES = ("roundabouts", "centers", "pairs", "incoming", "output")
+
+    circom_threshold = _StageParameter("roundabouts")
+    area_threshold = _StageParameter("roundabouts")
+    include_adjacent = _StageParameter("roundabouts")
+    adjacency = _StageParameter("roundabouts")
+    max_forming_edges = _StageParameter("roundabouts")
+    center_type = _StageParameter("centers")
+    angle_threshold = _StageParameter("incoming")
+
+    def __init__(
+        self,
+        edges,
+        polys=None,
+        sindex=None,
+        circom_threshold=0.7,
+        area_threshold=0.85,
+        include_adjacent=True,
+        center_type="centroid",
+        angle_threshold=0,
+        adjacency="geometry",
+        max_forming_edges=3,
+    ):
+        if sindex is None:
+            sindex = SpatialIndexContext(edges, polys)
+        elif polys is not None:
+            raise ValueError("`polys` and `sindex` cannot be passed together.")
+        self.edges = edges
+        self.sindex = sindex
+        self._params = {}
+        self._stages = {}
+        self.circom_threshold = circom_threshold
+        self.area_threshold = area_threshold
+        self.include_adjacent = include_adjacent
+        self.center_type = center_type
+        self.angle_threshold = angle_threshold
+        self.adjacency = adjacency
+        self.max_forming_edges = max_forming_edges
+
+    def _invalidate(self, stage):
+        for name in self._STAGES[self._STAGES.index(stage) :]:
+            self._stages.pop(name, None)
+
+    def _stage(self, name, func):
+        if name not in self._stages:
+            self._stages[name] = func()
+        return self._stages[name]
+
+    def set_params(self, **params):
+        """Sets several parameters at once. Returns the simplifier."""
+        for name, value in params.items():
+            if not isinstance(getattr(type(self), name, None), _StageParameter):
+                raise ValueError(f"Unknown parameter `{name}`.")
+            setattr(self, name, value)
+        return self
+
+    @property
+    def polys(self):
+        return self.sindex.polys
+
+    @property
+    def roundabouts(self):
+        return self._stage(
+            "roundabouts",
+            lambda: _selecting_rabs_from_poly(
+                self.polys,
+                circom_threshold=self.circom_threshold,
+                area_threshold=self.area_threshold,
+                include_adjacent=self.include_adjacent,
+                sindex=self.sindex,
+                adjacency=self.adjacency,
+                max_forming_edges=self.max_forming_edges,
+            ),
+        )
+
+    @property
+    def centers(self):
+        return self._stage(
+            "centers",
+            lambda: _rabs_center_points(self.roundabouts, center_type=self.center_type),
+        )
+
+    @property
+    def _pairs(self):
+        # candidate pairs of roundabouts and edges, independent of angle_threshold
+        return self._stage(
+            "pairs",
+            lambda: self.sindex.query_edges(
+                self.centers.geometry.values.data, ["touches", "covered_by"]
+            ),
+        )
+
+    @property
+    def incoming(self):
+        return self._stage(
+            "incoming",
+            lambda: _incoming_from_pairs(
+                self.centers,
+                self.edges,
+                *self._pairs,
+                angle_threshold=self.angle_threshold,
+            ),
+        )
+
+    @property
+    def output(self):
+        return self._stage(
+            "output", lambda: _ext_lines_to_center(self.edges, *self.incoming)
+        )
+
+    def detect(self):
+        """
+        Detection only: the roundabouts found with the current parameters, one row
+        per roundabout with its multipolygon and ``center_pt``. No incoming lines
+        are selected and no edges are built.
+        """
+        return self.centers
@@ -0,0 +1,286 @@
+"""
+Streaming execution of ``roundabout_simplification`` for extracts that do not fit in
+memory.
+
+Edges are read from a GeoPackage or GeoParquet file (any format GDAL can read) in
+square windows extended by a halo, simplified, and written to the output one batch
+per window. Peak memory is therefore bounded by the size of a window plus its halo
+rather than by the size of the dataset.
+
+Windows follow the tiled mode of ``rabs_simplify``: the global area threshold is
+computed in a first pass over the windows, and every edge is written by the single
+window holding the centre of its bounding box. As long as the halo is wide enough to
+hold every roundabout touching a window, the output matches the in-memory one.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from rabs_simplify import (
+    SpatialIndexContext,
+    _check_halo,
+    _ext_lines_to_center,
+    _global_area_threshold,
+    _rabs_center_points,
+    _selecting_incoming_lines,
+    _selecting_rabs_from_poly,
+    _tile_grid,
+    _tile_owner,
+    _tile_polygon_stats,
+)
+from writers import stringify_lists
+
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+
+def _windows(src, layer, origin, window_size, halo, tiles, columns=None):
+    """
+    Yields every non-empty window as ``(tile, edges)``, ``edges`` being the
+    GeoDataFrame (indexed by fid) of the features intersecting the window plus halo,
+    with the attribute ``columns`` (all of them if None, only the geometry if empty).
+    Windows are read with a bounding box filter, which uses the spatial index of
+    GeoPackage and the row group statistics of GeoParquet instead of scanning the
+    bounds of every feature or reading features one by one.
+    """
+    width = window_size + 2 * halo
+    for tile in tiles:
+        x0 = origin[0] + tile[0] * window_size - halo
+        y0 = origin[1] + tile[1] * window_size - halo
+        edges = pyogrio.read_dataframe(
+            src,
+            layer=layer,
+            columns=columns,
+            bbox=(x0, y0, x0 + width, y0 + width),
+            fid_as_index=True,
+        )
+        if len(edges):
+            yield tile, edges
+
+
+def _owned_fids(fids, owner, shape):
+    """
+    Groups ``fids`` by owning window, once. Returns a function giving the fids owned
+    by a window and the number of fids owned by each window.
+    """
+    key = owner[:, 1] * shape[0] + owner[:, 0]
+    order = np.argsort(key, kind="stable")
+    starts = np.searchsorted(key[order], np.arange(shape[0] * shape[1] + 1))
+
+    def owned(tile):
+        k = tile[1] * shape[0] + tile[0]
+        return fids[order[starts[k] : starts[k + 1]]]
+
+    return owned, np.diff(starts)
+
+
+def _window_simplification(
+    edges,
+    area_threshold_val,
+    circom_threshold,
+    include_adjacent,
+    center_type,
+    angle_threshold,
+):
+    """
+    Runs the simplification stages on the edges of a window with a fixed area
+    threshold. Unlike the tiled mode, every roundabout of the window is processed,
+    since the edges it touches may be owned by the window even when the roundabout
+    is not.
+    """
+    sindex = SpatialIndexContext(edges, polygonize_cache=False)
+    rab = _selecting_rabs_from_poly(
+        sindex.polys,
+        circom_threshold=circom_threshold,
+        include_adjacent=include_adjacent,
+        area_threshold_val=area_threshold_val,
+        sindex=sindex,
+    )
+    if rab.empty:
+        return edges
+    rab_multipolygons = _rabs_center_points(rab, center_type=center_type)
+    incoming_all, idx_drop = _selecting_incoming_lines(
+        rab_multipolygons, edges, angle_threshold=angle_threshold, sindex=sindex
+    )
+
+    return _ext_lines_to_center(edges, incoming_all, idx_drop)
+
+
+class _BatchWriter:
+    """
+    Writes GeoDataFrames to ``dst`` in batches. A ``.gpkg`` destination is a single
+    layer appended to after the first batch; a ``.parquet`` destination is a
+    directory of GeoParquet parts (one per batch) readable as a single dataset with
+    ``geopandas.read_parquet``.
+    """
+
+    def __init__(self, dst, layer=None):
+        ext = os.path.splitext(dst)[1].lower()
+        if ext == ".gpkg":
+            self.format = "gpkg"
+        elif ext in (".parquet", ".geoparquet"):
+            self.format = "parquet"
+            os.makedirs(dst, exist_ok=True)
+            # parts of a previous run would otherwise be read with the new ones
+            for part in glob.glob(os.path.join(dst, "part-*.parquet")):
+                os.remove(part)
+        else:
+            raise ValueError(
+                f"Unsupported output format '{ext}'. Use '.gpkg' or '.parquet'."
+            )
+        self.dst = dst
+        self.layer = layer
+        self.n_batches = 0
+        self.n_rows = 0
+
+    def write(self, gdf):
+        gdf = gdf.reset_index(drop=True)
+        if self.format == "gpkg":
+            pyogrio.write_dataframe(
+                stringify_lists(gdf),
+                self.dst,
+                layer=self.layer,
+                driver="GPKG",
+                append=self.n_batches > 0,
+            )
+        else:
+            gdf.to_parquet(
+                os.path.join(self.dst, f"part-{self.n_batches:05d}.parquet"),
+                index=False,
+            )
+        self.n_batches += 1
+        self.n_rows += len(gdf)
+
+
+def stream_roundabout_simplification(
+    src,
+    dst,
+    window_size,
+    halo=None,
+    layer=None,
+    dst_layer=None,
+    circom_threshold=0.7,
+    area_threshold=0.85,
+    include_adjacent=True,
+    center_type="centroid",
+    angle_threshold=0,
+):
+    """
+    Streaming version of ``roundabout_simplification`` reading edges from ``src``
+    and writing the simplified edges to ``dst`` window by window.
+
+    Only the bounding boxes of all edges are held in memory; the edges themselves
+    are read one window (plus halo) at a time. Each window is read twice, once to
+    compute the global area threshold and once to simplify it.
+
+    Parameters
+    ----------
+    src : str
+        path to the input edges (GeoPackage, GeoParquet or any format readable by
+        ``pyogrio``)
+    dst : str
+        path to the output. ``.gpkg`` writes a single GeoPackage layer,
+        ``.parquet`` writes a directory of GeoParquet parts, one per window.
+    window_size : float
+        side of the square windows in the units of the CRS of ``src``
+    halo : float (default None)
+        distance by which each window is extended when it is read. Defaults to
+        ``window_size / 4``. It must be wide enough to close every block and hold
+        every roundabout with its adjacent polygons; a warning is raised when it is
+        smaller than twice the diameter of the largest roundabout or than the
+        largest block.
+    layer : str (default None)
+        layer of ``src`` to read
+    dst_layer : str (default None)
+        layer of ``dst`` to write (GeoPackage only)
+    circom_threshold : float (default 0.7)
+        see ``roundabout_simplification``
+    area_threshold : float (default 0.85)
+        see ``roundabout_simplification``
+    include_adjacent : boolean (default True)
+        see ``roundabout_simplification``
+    center_type : string (default 'centroid')
+        see ``roundabout_simplification``
+    angle_threshold : int, float (default 0)
+        see ``roundabout_simplification``
+
+    Returns
+    -------
+    int
+        number of edges written to ``dst``
+    """
+    if pyogrio is None:
+        raise ImportError(
+            "Streaming simplification requires `pyogrio`. "
+            "Install it with `pip install pyogrio`."
+        )
+    if halo is None:
+        halo = window_size / 4
+
+    fids, bounds = pyogrio.read_bounds(src, layer=layer)
+    bounds = bounds.T
+    if len(fids) == 0:
+        return 0
+    total_bounds = (
+        bounds[:, 0].min(),
+        bounds[:, 1].min(),
+        bounds[:, 2].max(),
+        bounds[:, 3].max(),
+    )
+    origin, shape, tiles = _tile_grid(total_bounds, window_size)
+    # every edge is written by the window holding the centre of its bounding box
+    owner = _tile_owner(
+        np.column_stack(
+            [(bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2]
+        ),
+        origin,
+        window_size,
+        shape,
+    )
+
+    # first pass: global area threshold and halo check, on the geometries only
+    stats = [
+        _tile_polygon_stats((edges, tile, origin, window_size, shape))
+        for tile, edges in _windows(
+            src, layer, origin, window_size, halo, tiles, columns=[]
+        )
+    ]
+    area_threshold_val, max_diameter, max_block = _global_area_threshold(
+        stats, area_threshold, circom_threshold
+    )
+    _check_halo(halo, max_diameter, max_block, name="halo")
+
+    # second pass: simplification and batched writing of the owned edges
+    owned_fids, counts = _owned_fids(fids, owner, shape)
+    writer = _BatchWriter(dst, layer=dst_layer)
+    # tiles are listed row by row, as the keys of ``_owned_fids``
+    busy = tiles[counts > 0]
+    for tile, edges in _windows(src, layer, origin, window_size, halo, busy):
+        owned = owned_fids(tile)
+        missing = owned[~np.isin(owned, edges.index)]
+        if len(missing):
+            # long edges owned by the window whose geometry misses the window plus
+            # halo, only their bounding box reaches it
+            edges = pd.concat(
+                [
+                    edges,
+                    pyogrio.read_dataframe(
+                        src, layer=layer, fids=missing, fid_as_index=True
+                    ),
+                ]
+            )
+        output = _window_simplification(
+            edges,
+            area_threshold_val,
+            circom_threshold,
+            include_adjacent,
+            center_type,
+            angle_threshold,
+        )
+        writer.write(output[output.index.isin(owned)])
+
+    return writer.n_rows
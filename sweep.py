@@ -0,0 +1,193 @@
+"""
+Parameter sweeps of ``roundabout_simplification``.
+
+Tuning ``circom_threshold``, ``area_threshold``, ``include_adjacent``,
+``center_type`` and ``angle_threshold`` for a city by calling
+``roundabout_simplification`` once per combination repeats the polygonization, the
+polygon metrics, the adjacency queries and the Hausdorff distances every time.
+``roundabout_simplification_sweep`` computes those once:
+
+- polygons, area and circular compactness (one ``SpatialIndexContext``)
+- the group of every roundabout candidate of *any* combination, its multipolygon,
+  center point and its candidate pairs with the edges, once per
+  ``include_adjacent`` and ``center_type``
+
+and then applies each combination as a filter on those arrays. Only the COINS
+filtering and, if results are requested, the extension of the lines are run per
+combination.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from rabs_simplify import (
+    SpatialIndexContext,
+    _ext_lines_to_center,
+    _incoming_from_pairs,
+    _rab_groups,
+    _rabs_center_points,
+)
+
+# parameters that can be swept, with the defaults of roundabout_simplification
+SWEEP_DEFAULTS = {
+    "circom_threshold": 0.7,
+    "area_threshold": 0.85,
+    "include_adjacent": True,
+    "center_type": "centroid",
+    "angle_threshold": 0,
+}
+
+
+def _expand_grid(param_grid):
+    """
+    List of parameter dicts from ``param_grid``, either a dict of lists (cartesian
+    product) or a list of dicts. Missing parameters take their default value.
+    """
+    if isinstance(param_grid, dict):
+        keys = list(param_grid)
+        combos = [
+            dict(zip(keys, values))
+            for values in itertools.product(*(param_grid[k] for k in keys))
+        ]
+    else:
+        combos = [dict(c) for c in param_grid]
+
+    for combo in combos:
+        unknown = set(combo) - set(SWEEP_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Parameters {sorted(unknown)} cannot be swept.")
+
+    return [{**SWEEP_DEFAULTS, **c} for c in combos]
+
+
+class _GroupsCache:
+    """
+    Roundabout groups, multipolygons and edge pairs of the union of candidates of a
+    sweep, computed on first use for each ``include_adjacent`` and ``center_type``.
+    """
+
+    def __init__(self, polys, candidates, sindex):
+        self.polys = polys
+        self.candidates = candidates
+        self.sindex = sindex
+        self._groups = {}
+        self._pairs = {}
+
+    def groups(self, include_adjacent):
+        if include_adjacent not in self._groups:
+            self._groups[include_adjacent] = _rab_groups(
+                self.polys,
+                self.polys[self.candidates].copy(),
+                include_adjacent=include_adjacent,
+                sindex=self.sindex,
+            )
+        return self._groups[include_adjacent]
+
+    def pairs(self, include_adjacent, center_type):
+        key = (include_adjacent, center_type)
+        if key not in self._pairs:
+            rab_multipolygons = _rabs_center_points(
+                self.groups(include_adjacent), center_type=center_type
+            )
+            rab_pos, edge_pos, masks = self.sindex.query_edges(
+                rab_multipolygons.geometry.values.data, ["touches", "covered_by"]
+            )
+            self._pairs[key] = rab_multipolygons, rab_pos, edge_pos, masks
+        return self._pairs[key]
+
+
+def roundabout_simplification_sweep(
+    edges, param_grid, polys=None, sindex=None, summary=True
+):
+    """
+    Runs ``roundabout_simplification`` for every parameter combination of
+    ``param_grid``, reusing the threshold-independent intermediates across them.
+
+    Parameters
+    ----------
+    edges : GeoDataFrame
+        GeoDataFrame containing LineString geometry of urban network
+    param_grid : dict or list of dicts
+        Either a dict mapping parameter names to lists of values (every combination
+        is run) or a list of parameter dicts. Parameters that can be swept are
+        ``circom_threshold``, ``area_threshold``, ``include_adjacent``,
+        ``center_type`` and ``angle_threshold``; missing ones take the defaults of
+        ``roundabout_simplification``.
+    polys : GeoDataFrame (default None)
+        see ``roundabout_simplification``
+    sindex : SpatialIndexContext (default None)
+        see ``roundabout_simplification``
+    summary : boolean (default True)
+        If True, returns a summary table. Otherwise returns the simplified edges of
+        every combination.
+
+    Returns
+    -------
+    DataFrame or list of (dict, GeoDataFrame)
+        If ``summary``, one row per combination with its parameters and the number
+        of roundabouts found, edges dropped and edges extended. Otherwise a list of
+        (parameters, simplified edges) pairs.
+    """
+    combos = _expand_grid(param_grid)
+    if sindex is None:
+        sindex = SpatialIndexContext(edges, polys)
+    elif polys is not None:
+        raise ValueError("`polys` and `sindex` cannot be passed together.")
+
+    gdf = sindex.polys.copy()
+    area = sindex.metrics["area"].to_numpy()
+    circom = sindex.metrics["circom"].to_numpy()
+    gdf["area"] = area
+
+    # candidates of every combination, the same selection as
+    # _selecting_rabs_from_poly
+    quantiles = {
+        a: gdf["area"].quantile(a) for a in {c["area_threshold"] for c in combos}
+    }
+    candidates = [
+        (circom > c["circom_threshold"]) & (area < quantiles[c["area_threshold"]])
+        for c in combos
+    ]
+    cache = _GroupsCache(gdf, np.logical_or.reduce(candidates), sindex)
+
+    rows = []
+    results = []
+    for combo, candidate in zip(combos, candidates):
+        if not candidate.any():
+            incoming_all, idx_drop = None, edges.index[:0]
+            n_rabs = 0
+        else:
+            rab_multipolygons, rab_pos, edge_pos, masks = cache.pairs(
+                combo["include_adjacent"], combo["center_type"]
+            )
+            # roundabouts of this combination among those of the union
+            selected = rab_multipolygons.index.isin(gdf.index[candidate])
+            new_pos = np.cumsum(selected) - 1
+            keep = selected[rab_pos]
+            incoming_all, idx_drop = _incoming_from_pairs(
+                rab_multipolygons[selected],
+                edges,
+                new_pos[rab_pos[keep]],
+                edge_pos[keep],
+                {k: v[keep] for k, v in masks.items()},
+                angle_threshold=combo["angle_threshold"],
+            )
+            n_rabs = int(selected.sum())
+
+        rows.append(
+            {
+                **combo,
+                "roundabouts": n_rabs,
+                "edges_dropped": len(idx_drop),
+                "edges_extended": 0 if incoming_all is None else len(incoming_all),
+            }
+        )
+        if not summary:
+            if incoming_all is None:
+                output = edges.copy()
+            else:
+                output = _ext_lines_to_center(edges, incoming_all, idx_drop)
+            results.append((combo, output))
+
+    return pd.DataFrame(rows) if summary else results
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from overpass_loader import load_overpass_edges  # noqa: E402
+
+CACHE_DIR = os.path.join(ROOT, "cache")
+# a small town from the Overpass responses of ``cache/``
+CITY = "a8b5604b31277aa629813b4dcb2ec5b214b981e3.json"
+
+
+@pytest.fixture(scope="session")
+def city_edges():
+    return load_overpass_edges(os.path.join(CACHE_DIR, CITY))
+
+
+@pytest.fixture
+def edges(city_edges):
+    return city_edges.copy()
+
+
+def assert_same_edges(result, expected):
+    """Same labels and geometries, regardless of row order."""
+    result = result.sort_index()
+    expected = expected.sort_index()
+    assert result.index.equals(expected.index)
+    assert result.geometry.geom_equals_exact(expected.geometry, 1e-9).all()
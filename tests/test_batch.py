@@ -0,0 +1,62 @@
+import json
+import os
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from batch import run_batch
+from conftest import CACHE_DIR, CITY
+from writers import stringify_lists
+
+# a Nominatim response stored in ``cache/``, not a network
+NOMINATIM = "5b7c7b19c580a38118a4a8e252ab8f438d17227a.json"
+
+
+def test_resume_compares_params_and_records_skipped(tmp_path):
+    paths = [os.path.join(CACHE_DIR, CITY), os.path.join(CACHE_DIR, NOMINATIM)]
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    kwargs = dict(checkpoint=checkpoint, fmt="parquet", max_workers=1)
+
+    first = run_batch(paths, str(tmp_path / "out"), **kwargs)
+    assert (first["done"], first["skipped"], first["failed"]) == (1, 1, {})
+    with open(checkpoint) as f:
+        records = [json.loads(line) for line in f]
+    assert {r["input"]: r.get("skipped", False) for r in records} == {
+        paths[0]: False,
+        paths[1]: True,
+    }
+    assert all(r["fmt"] == "parquet" and r["params"] == {} for r in records)
+
+    resumed = run_batch(paths, str(tmp_path / "out"), **kwargs)
+    assert (resumed["done"], resumed["skipped"]) == (0, 2)
+
+    changed = run_batch(paths, str(tmp_path / "out"), circom_threshold=0.8, **kwargs)
+    assert (changed["done"], changed["skipped"]) == (1, 1)
+
+    # the same job into another directory is not done yet
+    moved = run_batch(paths, str(tmp_path / "other"), circom_threshold=0.8, **kwargs)
+    assert (moved["done"], moved["skipped"]) == (1, 1)
+
+
+def test_gpkg_layer_named_after_city(tmp_path):
+    path = os.path.join(CACHE_DIR, CITY)
+    out = tmp_path / "out"
+
+    run_batch([path], str(out), fmt="gpkg", max_workers=1)
+
+    name = os.path.splitext(CITY)[0]
+    assert os.listdir(out) == [name + ".gpkg"]
+    assert not gpd.read_file(out / (name + ".gpkg"), layer=name).empty
+
+
+def test_stringify_lists():
+    gdf = gpd.GeoDataFrame(
+        {"osmid": [[1, 2], 3, None], "name": ["a", ["b", "c"], None]},
+        geometry=[Point(0, 0)] * 3,
+    )
+
+    stringify_lists(gdf)
+
+    assert gdf["osmid"].tolist()[:2] == ["[1, 2]", 3]
+    assert gdf["name"].tolist()[:2] == ["a", "['b', 'c']"]
+    assert gdf[["osmid", "name"]].iloc[2].isna().all()
@@ -0,0 +1,42 @@
+import numpy as np
+import pygeos
+import pytest
+from geopandas import GeoDataFrame
+from shapely.geometry import Polygon
+
+from rabs_simplify import _rabs_center_points
+
+
+@pytest.fixture
+def rab():
+    # roundabout 7 alone, roundabout 3 with an adjacent triangle; rows are not
+    # ordered by roundabout
+    return GeoDataFrame(
+        {"index_right": [7, 3, 3]},
+        geometry=[
+            Polygon([(0, 0), (2, 0), (2, 2), (0, 2)]),
+            Polygon([(12, 0), (14, 1), (12, 2)]),
+            Polygon([(10, 0), (12, 0), (12, 2), (10, 2)]),
+        ],
+        index=[7, 5, 3],
+        crs="EPSG:32633",
+    )
+
+
+def test_mbc_centers(rab):
+    centers = _rabs_center_points(rab, center_type="mbc")
+
+    assert centers.index.tolist() == [3, 7]
+    for label, group in rab.groupby("index_right"):
+        circle = pygeos.minimum_bounding_circle(
+            pygeos.union_all(group.geometry.values.data)
+        )
+        expected = pygeos.get_coordinates(pygeos.centroid(circle))[0]
+        actual = np.array(centers.center_pt.loc[label].coords[0])
+        np.testing.assert_allclose(actual, expected, atol=1e-9)
+    np.testing.assert_allclose(centers.center_pt.loc[7].coords[0], (1, 1), atol=1e-6)
+
+
+def test_unknown_center_type(rab):
+    with pytest.raises(ValueError, match="center_type"):
+        _rabs_center_points(rab, center_type="median")
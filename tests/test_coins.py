@@ -0,0 +1,64 @@
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString
+
+import rabs_simplify as rs
+
+
+def _incoming_many():
+    """
+    Two groups of incoming lines sharing a connector line, listed in the opposite
+    order of their line keys. In each group one line continues straight into the
+    connector line.
+    """
+    rows = [
+        # group 1, around (1000, 1000) with its center to the north
+        ((1000, 990), (1000, 1000), (1000, 1005), 1),
+        ((990, 1000), (1000, 1000), (1000, 1005), 1),
+        # group 0, around (0, 0) with its center to the east
+        ((-10, 0), (0, 0), (5, 0), 0),
+        ((0, -10), (0, 0), (5, 0), 0),
+    ]
+    return gpd.GeoDataFrame(
+        {
+            "index_right": [1, 1, 0, 0],
+            "line": gpd.GeoSeries([LineString([end, c]) for _, end, c, _ in rows]),
+            "line_key": [key for *_, key in rows],
+        },
+        geometry=gpd.GeoSeries([LineString([start, end]) for start, end, *_ in rows]),
+        index=[10, 11, 12, 13],
+    )
+
+
+@pytest.mark.parametrize("angle_threshold", [0, 60])
+def test_batched_coins_matches_per_group(angle_threshold):
+    incoming_many = _incoming_many()
+
+    batched = rs._coins_filtering_many_incoming(
+        incoming_many, angle_threshold=angle_threshold, batched=True
+    )
+    per_group = rs._coins_filtering_many_incoming(
+        incoming_many, angle_threshold=angle_threshold, batched=False
+    )
+
+    assert batched.index.equals(per_group.index)
+    assert {10, 12} <= set(batched.index)
+
+
+def test_batched_coins_matches_per_group_on_city(edges, monkeypatch):
+    captured = []
+    original = rs._coins_filtering_many_incoming
+
+    def capture(incoming_many, **kwargs):
+        captured.append(incoming_many)
+        return original(incoming_many, **kwargs)
+
+    monkeypatch.setattr(rs, "_coins_filtering_many_incoming", capture)
+    rs.roundabout_simplification(edges)
+    (incoming_many,) = captured
+    assert not incoming_many.empty
+
+    batched = original(incoming_many, batched=True)
+    per_group = original(incoming_many, batched=False)
+
+    assert batched.index.equals(per_group.index)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from geopandas import GeoDataFrame
+from geopandas.testing import assert_geodataframe_equal
+from shapely.geometry import LineString
+
+from columnar import ColumnarEdges
+
+
+@pytest.fixture
+def gdf():
+    index = pd.MultiIndex.from_arrays(
+        [[1, 1, 2], [2, 3, 3], [0, 0, 1]], names=["u", "v", "key"]
+    )
+    return GeoDataFrame(
+        {
+            "length": [1.5, 2.0, np.nan],
+            "lanes": np.array([1, 2, 3], dtype=np.int32),
+            "oneway": [True, False, True],
+            "osmid": [10, [11, 12], 13],
+            "bridge": [True, None, False],
+            "maxspeed": pd.array([50, None, 30], dtype="Int64"),
+            "lit": pd.array([True, None, False], dtype="boolean"),
+            "highway": pd.Categorical(["primary", "residential", "primary"]),
+            "name": ["Main", None, "Rue de l'Église"],
+            "ref": pd.array(["A1", None, "B2"], dtype="string"),
+        },
+        geometry=[
+            LineString([(0, 0), (1, 0)]),
+            LineString([(1, 0), (1, 1), (2, 1)]),
+            LineString([(2, 1), (3, 3)]),
+        ],
+        index=index,
+        crs="EPSG:32633",
+    )
+
+
+def test_round_trip_keeps_dtypes(gdf):
+    columnar = ColumnarEdges.from_geodataframe(gdf)
+
+    assert_geodataframe_equal(columnar.to_geodataframe(), gdf)
+    assert columnar.column("osmid")[1] == [11, 12]
+
+
+def test_file_round_trip(gdf, tmp_path):
+    path = str(tmp_path / "edges.rabcol")
+    ColumnarEdges.from_geodataframe(gdf).to_file(path)
+
+    mapped = ColumnarEdges.from_file(path)
+
+    assert not mapped.column("lanes").flags.writeable
+    assert_geodataframe_equal(mapped.to_geodataframe(), gdf)
+
+
+def test_shared_memory_round_trip(gdf):
+    shm, meta = ColumnarEdges.from_geodataframe(gdf).to_shared_memory()
+    try:
+        attached = ColumnarEdges.from_shared_memory(shm.name, meta)
+        assert_geodataframe_equal(attached.to_geodataframe(), gdf)
+        del attached
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_unsupported_column_raises(gdf):
+    gdf["tags"] = [("a", 1), None, ("b", 2)]
+
+    with pytest.raises(ValueError, match="tags"):
+        ColumnarEdges.from_geodataframe(gdf)
+
+
+def test_numpy_scalars_in_object_columns(gdf):
+    gdf["osmid"] = pd.Series(
+        [np.int64(10), [np.int64(11), 12], np.int64(13)], dtype=object, index=gdf.index
+    )
+    gdf["name"] = pd.Series(
+        [np.str_("Main"), None, "Rue"], dtype=object, index=gdf.index
+    )
+
+    result = ColumnarEdges.from_geodataframe(gdf).to_geodataframe()
+
+    assert result["osmid"].tolist() == [10, [11, 12], 13]
+    assert type(result["osmid"].iloc[0]) is int
+    assert result["name"].tolist() == ["Main", None, "Rue"]
@@ -0,0 +1,116 @@
+import numpy as np
+import pygeos
+import pytest
+from geopandas import GeoDataFrame
+from shapely.geometry import LineString, Point
+
+from complex_junctions import (
+    _binned_kde,
+    _create_shape_index,
+    _shape_index_threshold,
+    invalid_adjacency_grouping,
+    invalid_polygons,
+)
+from rabs_simplify import RoundaboutSimplifier
+
+
+def test_binned_kde_matches_direct_sum():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 500)
+    grid = np.linspace(-6, 6, 2001)
+    bandwidth = 0.4
+
+    density = _binned_kde(values, grid, bandwidth)
+
+    kernel = np.exp(-0.5 * ((grid[:, None] - values) / bandwidth) ** 2)
+    direct = kernel.mean(axis=1) / (bandwidth * np.sqrt(2 * np.pi))
+    np.testing.assert_allclose(density, direct, atol=1e-4)
+    assert density.sum() * (grid[1] - grid[0]) == pytest.approx(1, abs=1e-3)
+
+
+def test_shape_index_threshold_between_modes():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(1, 0.1, 300), rng.normal(3, 0.1, 300)])
+
+    threshold = _shape_index_threshold(values, upper=4)
+
+    assert 1.5 < threshold < 2.5
+
+
+def test_shape_index_threshold_without_spread():
+    assert np.isnan(_shape_index_threshold(np.full(10, 2.0), upper=4))
+    assert np.isnan(_shape_index_threshold(np.array([1.0, 2.0]), upper=0))
+
+
+def test_invalid_polygons(edges):
+    simplifier = RoundaboutSimplifier(edges)
+
+    invalid = invalid_polygons(simplifier)
+
+    threshold = invalid.attrs["shape_index_threshold"]
+    assert 0 < threshold
+    assert 0 < len(invalid) < len(simplifier.polys)
+    assert not invalid.index.isin(simplifier.roundabouts.index).any()
+    shape = _create_shape_index(simplifier.polys)
+    selected = shape.shape_index[~shape.index.isin(simplifier.roundabouts.index)]
+    assert invalid.index.sort_values().equals(
+        selected.index[selected <= threshold].sort_values()
+    )
+    assert list(invalid.columns) == [
+        invalid.geometry.name,
+        "area",
+        "reock",
+        "shape_index",
+    ]
+
+
+def test_invalid_polygons_warns_without_bound(edges):
+    simplifier = RoundaboutSimplifier(edges)
+
+    with pytest.warns(UserWarning, match="no minimum"):
+        invalid = invalid_polygons(simplifier, max_area=0)
+
+    assert invalid.empty
+    assert np.isnan(invalid.attrs["shape_index_threshold"])
+
+
+def test_invalid_adjacency_grouping():
+    # unit squares A (0-1) and B (1-2) with a dangling edge inside A, and the square
+    # at 3-4 split by its diagonal into two triangles
+    segments = [
+        [(0, 0), (1, 0)],
+        [(1, 0), (2, 0)],
+        [(0, 1), (1, 1)],
+        [(1, 1), (2, 1)],
+        [(0, 0), (0, 1)],
+        [(1, 0), (1, 1)],
+        [(2, 0), (2, 1)],
+        [(0, 1), (0.5, 0.5)],
+        [(3, 0), (4, 0), (4, 1)],
+        [(4, 1), (3, 1), (3, 0)],
+        [(3, 0), (4, 1)],
+    ]
+    edges = GeoDataFrame(geometry=[LineString(s) for s in segments])
+    simplifier = RoundaboutSimplifier(edges)
+    polys = simplifier.polys
+    inside = [(0.25, 0.5), (1.5, 0.5), (3.75, 0.25), (3.25, 0.75)]
+    pos = [int(np.flatnonzero(polys.contains(Point(xy)))[0]) for xy in inside]
+    invalid = polys.iloc[pos]
+
+    grouped, covered = invalid_adjacency_grouping(invalid, simplifier)
+
+    groups = grouped.index.to_numpy()
+    assert groups[0] == groups[1] != groups[2] == groups[3]
+    assert grouped["index"].tolist() == invalid.index.tolist()
+    # the dangling edge is not a forming edge of A
+    assert grouped.num_edges.tolist() == [4, 4, 2, 2]
+    assert len(covered) == 12
+    assert covered.group_idx.value_counts().sort_index().tolist() == [8, 4]
+    lines = edges.geometry.values.data[covered[0].to_numpy()]
+    ends = pygeos.get_coordinates(covered.nodes_pts.values.data).reshape(-1, 2, 2)
+    np.testing.assert_array_equal(
+        ends[:, 0], pygeos.get_coordinates(pygeos.get_point(lines, 0))
+    )
+    np.testing.assert_array_equal(
+        ends[:, 1], pygeos.get_coordinates(pygeos.get_point(lines, -1))
+    )
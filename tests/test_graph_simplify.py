@@ -0,0 +1,66 @@
+import momepy
+import networkx as nx
+import numpy as np
+import pygeos
+import pytest
+from geopandas import GeoSeries
+
+from graph_simplify import roundabout_simplification_graph
+from rabs_simplify import roundabout_simplification
+
+
+def _wkt(geoms):
+    """Sorted WKT of normalized geometries, to compare them regardless of order."""
+    geoms = pygeos.normalize(GeoSeries(list(geoms)).values.data)
+    return sorted(pygeos.to_wkt(geoms, rounding_precision=6, trim=True))
+
+
+def _integer_nodes(G):
+    """``G`` relabelled as OSMnx does, integer ids with ``x``/``y`` attributes."""
+    G = nx.convert_node_labels_to_integers(G, label_attribute="xy")
+    for _, data in G.nodes(data=True):
+        data["x"], data["y"] = data.pop("xy")
+    return G
+
+
+def _node_xy(G, node):
+    data = G.nodes[node]
+    return (data["x"], data["y"]) if "x" in data else node
+
+
+def _check_rewired(G, original_nodes):
+    """Every new node is a roundabout center reached by the ends of its edges."""
+    new_nodes = set(G.nodes) - original_nodes
+    assert new_nodes
+    for node in new_nodes:
+        xy = np.asarray(_node_xy(G, node))
+        assert G.degree(node) > 0
+        for _, _, geom in G.edges(node, data="geometry"):
+            coords = np.asarray(geom.coords)
+            assert min(np.hypot(*(coords[[0, -1]] - xy).T)) < 1e-9
+    return new_nodes
+
+
+@pytest.mark.parametrize("integer_nodes", [False, True])
+def test_graph_matches_geodataframe(edges, integer_nodes):
+    expected = roundabout_simplification(edges)
+    G = momepy.gdf_to_nx(edges, approach="primal")
+    if integer_nodes:
+        G = _integer_nodes(G)
+    original_nodes = set(G.nodes)
+    n_edges = G.number_of_edges()
+
+    result = roundabout_simplification_graph(G, crs=edges.crs)
+
+    assert result is G
+    assert G.number_of_edges() == len(expected) < n_edges
+    assert _wkt(g for _, _, g in G.edges(data="geometry")) == _wkt(expected.geometry)
+    new_nodes = _check_rewired(G, original_nodes)
+    if integer_nodes:
+        # new ids follow the largest existing one
+        first = max(original_nodes) + 1
+        assert sorted(new_nodes) == list(range(first, first + len(new_nodes)))
+    else:
+        assert all(isinstance(node, tuple) for node in new_nodes)
+    # no node is left without edges
+    assert min(dict(G.degree).values()) > 0
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from geopandas import GeoDataFrame
+from shapely.geometry import LineString, Point
+
+from incidence import PolygonEdgeIncidence
+from rabs_simplify import SpatialIndexContext, _selecting_rabs_from_poly
+
+# two unit squares A and B, a 3 x 1 rectangle R above them and a unit square on the
+# right split by its diagonal into the triangles TU (upper left) and TL (lower right)
+SEGMENTS = [
+    [(0, 0), (1, 0)],
+    [(1, 0), (2, 0)],
+    [(2, 0), (3, 0)],
+    [(0, 1), (1, 1)],
+    [(1, 1), (2, 1)],
+    [(2, 1), (3, 1)],
+    [(0, 2), (3, 2)],
+    [(0, 0), (0, 1)],
+    [(0, 1), (0, 2)],
+    [(1, 0), (1, 1)],
+    [(2, 0), (2, 1)],
+    [(3, 0), (3, 1)],
+    [(3, 1), (3, 2)],
+    [(2, 0), (3, 1)],
+]
+INSIDE = {
+    "A": (0.5, 0.5),
+    "B": (1.5, 0.5),
+    "R": (1.5, 1.5),
+    "TU": (2.25, 0.75),
+    "TL": (2.75, 0.25),
+}
+
+
+@pytest.fixture
+def sindex():
+    edges = GeoDataFrame(geometry=[LineString(s) for s in SEGMENTS])
+    return SpatialIndexContext(edges)
+
+
+def _positions(sindex):
+    """Position of every named polygon of the grid."""
+    polys = sindex.polys.geometry
+    return {
+        name: int(np.flatnonzero(polys.contains(Point(xy)))[0])
+        for name, xy in INSIDE.items()
+    }
+
+
+def _names(positions, found):
+    names = {pos: name for name, pos in positions.items()}
+    return {names[pos] for pos in found}
+
+
+def test_forming_edges_and_adjacency(sindex):
+    pos = _positions(sindex)
+    incidence = sindex.incidence
+
+    assert len(sindex.polys) == 5
+    forming = incidence.forming_edges()
+    assert {name: forming[p] for name, p in pos.items()} == {
+        "A": 4,
+        "B": 4,
+        "R": 6,
+        "TU": 3,
+        "TL": 3,
+    }
+
+    adjacency = incidence.adjacency.toarray()
+    pairs = {frozenset(_names(pos, pair)) for pair in zip(*np.nonzero(adjacency))}
+    assert pairs == {
+        frozenset(pair)
+        for pair in ["AB", "AR", "BR", ("B", "TU"), ("R", "TU"), ("TU", "TL")]
+    }
+    assert np.diag(adjacency).sum() == 0
+    assert adjacency.max() == 1
+
+
+def test_neighbours(sindex):
+    pos = _positions(sindex)
+    incidence = sindex.incidence
+    reached = {"A": {"A", "B", "R"}, "TL": {"TL", "TU"}}
+
+    for k, extra in [(1, {}), (2, {"A": {"TU"}, "TL": {"B", "R"}})]:
+        seed, found = incidence.neighbours([pos["A"], pos["TL"]], k=k)
+        assert (np.diff(seed) >= 0).all()
+        for i, name in enumerate(["A", "TL"]):
+            expected = reached[name] | extra.get(name, set())
+            assert _names(pos, found[seed == i]) == expected
+
+
+def test_incidence_from_pairs():
+    incidence = PolygonEdgeIncidence([0, 0, 1, 1], [0, 1, 1, 2], 3, 3)
+
+    np.testing.assert_array_equal(incidence.forming_edges(), [2, 2, 0])
+    np.testing.assert_array_equal(
+        incidence.adjacency.toarray(), [[0, 1, 0], [1, 0, 0], [0, 0, 0]]
+    )
+    seed, found = incidence.neighbours([2])
+    np.testing.assert_array_equal(seed, [0])
+    np.testing.assert_array_equal(found, [2])
+
+
+@pytest.mark.parametrize("max_forming_edges, with_tu", [(3, True), (2, False)])
+def test_topology_adjacency(sindex, max_forming_edges, with_tu):
+    pos = _positions(sindex)
+    polys = sindex.polys
+
+    # the squares are the only candidates (circular compactness 2 / pi)
+    rab = _selecting_rabs_from_poly(
+        polys,
+        circom_threshold=0.6,
+        area_threshold_val=2,
+        sindex=sindex,
+        adjacency="topology",
+        max_forming_edges=max_forming_edges,
+    )
+
+    groups = {
+        _names(pos, polys.index.get_indexer([label])).pop(): _names(
+            pos, polys.index.get_indexer(group.index)
+        )
+        for label, group in rab.groupby("index_right")
+    }
+    # R has too many edges and too large an area, A and B are roundabouts of their
+    # own and TL only touches B at a corner
+    assert groups == {"A": {"A"}, "B": {"B", "TU"} if with_tu else {"B"}}
+
+
+def test_topology_adjacency_requires_edges(sindex):
+    polys = sindex.polys
+
+    with pytest.raises(ValueError, match="SpatialIndexContext"):
+        _selecting_rabs_from_poly(polys, circom_threshold=0.6, adjacency="topology")
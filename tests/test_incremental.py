@@ -0,0 +1,113 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import LineString
+
+from conftest import assert_same_edges
+from incremental import (
+    IncrementalFrame,
+    _SortedAreas,
+    roundabout_simplification_with_state,
+    update_roundabout_simplification,
+)
+from rabs_simplify import roundabout_simplification
+
+
+def _roundabout_edge(edges):
+    """Label of an edge covered by a roundabout of ``edges``."""
+    _, state = roundabout_simplification_with_state(edges)
+    dropped = state.dropped.frame()
+    assert len(dropped)
+    return dropped.index[0]
+
+
+def _nudged(edges, label):
+    """``edges.loc[[label]]`` with its middle pushed sideways by 2% of its length."""
+    line = edges.geometry.loc[label]
+    (x0, y0), (x1, y1) = line.coords[0], line.coords[-1]
+    mid = line.interpolate(0.5, normalized=True)
+    offset = 0.02 * line.length / max(((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5, 1e-9)
+    moved = LineString(
+        [(x0, y0), (mid.x - (y1 - y0) * offset, mid.y + (x1 - x0) * offset), (x1, y1)]
+    )
+    modified = edges.loc[[label]]
+    return modified.set_geometry(
+        gpd.GeoSeries([moved], index=modified.index, crs=edges.crs)
+    )
+
+
+def _check(state, edges):
+    assert_same_edges(state.output.to_frame(), roundabout_simplification(edges))
+
+
+def test_update_removed_roundabout(edges):
+    label = _roundabout_edge(edges)
+    _, state = roundabout_simplification_with_state(edges)
+
+    state = update_roundabout_simplification(state, removed=[label])
+
+    _check(state, edges.drop(index=[label]))
+
+
+def test_update_added_roundabout(edges):
+    label = _roundabout_edge(edges)
+    _, state = roundabout_simplification_with_state(edges.drop(index=[label]))
+
+    state = update_roundabout_simplification(state, added=edges.loc[[label]])
+
+    _check(state, edges)
+
+
+def test_update_modified_roundabout(edges):
+    label = _roundabout_edge(edges)
+    modified = _nudged(edges, label)
+    _, state = roundabout_simplification_with_state(edges)
+
+    state = update_roundabout_simplification(state, modified=modified)
+
+    _check(state, pd.concat([edges.drop(index=[label]), modified]))
+
+
+def test_chained_updates(edges):
+    label = _roundabout_edge(edges)
+    _, state = roundabout_simplification_with_state(edges)
+
+    state = update_roundabout_simplification(state, removed=[label])
+    _check(state, edges.drop(index=[label]))
+    state = update_roundabout_simplification(state, added=edges.loc[[label]])
+    _check(state, edges)
+    modified = _nudged(edges, label)
+    state = update_roundabout_simplification(state, modified=modified)
+    _check(state, pd.concat([edges.drop(index=[label]), modified]))
+
+
+def test_incremental_frame_runs():
+    def rows(start, stop):
+        return pd.DataFrame({"a": range(start, stop)}, index=range(start, stop))
+
+    runs = IncrementalFrame(rows(0, 100))
+    removed = []
+    for start in range(100, 400, 10):
+        removed += range(start - 100, start - 95)
+        runs.remove(range(start - 100, start - 95))
+        runs.append(rows(start, start + 10))
+
+    assert len(runs.runs) < 10
+    assert len(runs) == 400 - len(removed)
+    pd.testing.assert_frame_equal(
+        runs.to_frame().sort_index(), rows(0, 400).drop(index=removed)
+    )
+    assert sorted(runs.loc([5, 7, 150, 399, 1000]).index) == [5, 7, 399]
+
+
+@pytest.mark.parametrize("q", [0, 0.3, 0.85, 1])
+def test_sorted_areas_quantile(q):
+    areas = pd.Series([float((i * 7919) % 1013) for i in range(3000)])
+    sorted_areas = _SortedAreas(areas, areas.index)
+    for label in range(0, 3000, 3):
+        sorted_areas.remove(areas[label], label)
+    kept = areas.drop(index=range(0, 3000, 3))
+
+    assert sorted_areas.quantile(q) == pytest.approx(kept.quantile(q))
+    between = sorted_areas.labels_between(100, 200)
+    assert sorted(between) == sorted(kept.index[(kept >= 100) & (kept < 200)])
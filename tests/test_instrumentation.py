@@ -0,0 +1,59 @@
+import tracemalloc
+
+import numpy as np
+
+from instrumentation import StageCollector, stage
+from rabs_simplify import roundabout_simplification
+
+
+def test_stage_traces_memory():
+    collector = StageCollector()
+
+    with collector.stage("allocate") as record:
+        data = np.ones(1_000_000)
+        record["items"] = len(data)
+        del data
+
+    assert not tracemalloc.is_tracing()
+    (record,) = collector.records
+    assert record["items"] == 1_000_000
+    assert record["peak_bytes"] >= 8_000_000
+    assert record["seconds"] >= 0
+
+
+def test_stage_keeps_caller_session():
+    tracemalloc.start()
+    try:
+        data = np.ones(1_000_000)
+        del data
+        peak = tracemalloc.get_traced_memory()[1]
+        collector = StageCollector()
+
+        with collector.stage("small"):
+            pass
+
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[1] >= peak >= 8_000_000
+        assert collector.records[0]["peak_bytes"] is None
+    finally:
+        tracemalloc.stop()
+
+
+def test_no_collector():
+    with stage(None, "polygonize") as record:
+        assert record is None
+
+
+def test_records_every_stage(edges):
+    records = []
+
+    roundabout_simplification(edges, collector=records.append)
+
+    assert [r["stage"] for r in records] == [
+        "polygonize",
+        "selecting_rabs",
+        "center_points",
+        "incoming_lines",
+        "ext_lines",
+    ]
+    assert all(r["peak_bytes"] >= 0 for r in records)
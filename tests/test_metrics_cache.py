@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pygeos
+import pytest
+
+import metrics_cache
+from conftest import assert_same_edges
+from rabs_simplify import SpatialIndexContext, roundabout_simplification
+
+
+def _polygons():
+    shell = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+    hole = [(2, 2), (4, 2), (4, 4), (2, 2)]
+    return np.array(
+        [
+            pygeos.polygons(shell, holes=[pygeos.linearrings(hole)]),
+            pygeos.polygons([(20, 0), (21, 0), (21, 1), (20, 0)]),
+            pygeos.polygons(shell),
+        ]
+    )
+
+
+def test_round_trip(tmp_path):
+    geoms = _polygons()
+    columns = {"area": pygeos.area(geoms), "n": np.arange(3)}
+
+    metrics_cache.save_metrics(str(tmp_path), "key", geoms, columns)
+    loaded, loaded_columns = metrics_cache.load_metrics(str(tmp_path), "key")
+
+    assert pygeos.equals_exact(loaded, geoms, tolerance=0).all()
+    assert pygeos.get_num_interior_rings(loaded).tolist() == [1, 0, 0]
+    assert loaded_columns.keys() == columns.keys()
+    for name, values in columns.items():
+        np.testing.assert_array_equal(loaded_columns[name], values)
+    assert metrics_cache.load_metrics(str(tmp_path), "missing") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    geoms = _polygons()
+    columns = {"area": pygeos.area(geoms)}
+    metrics_cache.save_metrics(cache_dir, "a", geoms, columns)
+    size = os.path.getsize(os.path.join(cache_dir, "a.npz"))
+    metrics_cache.save_metrics(cache_dir, "b", geoms, columns)
+    os.utime(os.path.join(cache_dir, "a.npz"), (0, 0))
+    os.utime(os.path.join(cache_dir, "b.npz"), (1, 1))
+    # loading marks "a" as the most recently used
+    metrics_cache.load_metrics(cache_dir, "a")
+
+    metrics_cache.save_metrics(cache_dir, "c", geoms, columns, max_bytes=2 * size)
+
+    assert sorted(os.listdir(cache_dir)) == ["a.npz", "c.npz"]
+
+
+def test_simplification_with_cache_dir(edges, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    expected = roundabout_simplification(edges)
+
+    first = roundabout_simplification(edges, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    # a second context reads the polygons and metrics from the cache
+    sindex = SpatialIndexContext(edges, cache_dir=cache_dir)
+    second = roundabout_simplification(edges, sindex=sindex)
+
+    assert_same_edges(first, expected)
+    assert_same_edges(second, expected)
+    with pytest.raises(ValueError, match="cache_dir"):
+        roundabout_simplification(edges, sindex=sindex, cache_dir=cache_dir)
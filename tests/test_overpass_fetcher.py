@@ -0,0 +1,76 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import CACHE_DIR, CITY
+from overpass_fetcher import OverpassError, fetch_overpass, serve_cache
+
+pytest.importorskip("aiohttp")
+
+PATH = os.path.join(CACHE_DIR, CITY)
+
+
+@pytest.fixture(scope="module")
+def city():
+    """Bounding box (slightly padded) and way ids of the cached city."""
+    with open(PATH) as f:
+        elements = json.load(f)["elements"]
+    lons = [e["lon"] for e in elements if e["type"] == "node"]
+    lats = [e["lat"] for e in elements if e["type"] == "node"]
+    bbox = (min(lons) - 1e-4, min(lats) - 1e-4, max(lons) + 1e-4, max(lats) + 1e-4)
+    return bbox, {e["id"] for e in elements if e["type"] == "way"}
+
+
+def _way_ids(response):
+    return {e["id"] for e in response["elements"] if e["type"] == "way"}
+
+
+def test_retries_honour_retry_after_and_fill_cache(city, tmp_path):
+    bbox, ways = city
+    server, url = serve_cache([PATH], fail_first=2)
+    try:
+        start = time.monotonic()
+        # a backoff of a minute: only Retry-After: 0 lets this finish quickly
+        response = fetch_overpass(
+            bbox, url=url, cache_folder=str(tmp_path), rate=None, backoff=60
+        )
+        assert time.monotonic() - start < 30
+        assert server.requests == 3
+        assert _way_ids(response) == ways
+        assert len(os.listdir(tmp_path)) == 1
+
+        # the second fetch is answered by the cache
+        cached = fetch_overpass(bbox, url=url, cache_folder=str(tmp_path), rate=None)
+        assert server.requests == 3
+        assert _way_ids(cached) == ways
+    finally:
+        server.shutdown()
+
+
+def test_non_json_body_is_retried(city, tmp_path):
+    bbox, ways = city
+    server, url = serve_cache([PATH], fail_first=1, fail_status=200)
+    try:
+        response = fetch_overpass(
+            bbox, url=url, cache_folder=str(tmp_path), rate=None, backoff=0.01
+        )
+        assert server.requests == 2
+        assert _way_ids(response) == ways
+    finally:
+        server.shutdown()
+
+
+def test_gives_up_after_retries(city, tmp_path):
+    bbox, _ = city
+    server, url = serve_cache([PATH], fail_first=10)
+    try:
+        with pytest.raises(OverpassError, match="after 3 attempts"):
+            fetch_overpass(
+                bbox, url=url, cache_folder=str(tmp_path), rate=None, retries=2
+            )
+        assert server.requests == 3
+        assert os.listdir(tmp_path) == []
+    finally:
+        server.shutdown()
@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+import pygeos
+import pytest
+
+from conftest import CACHE_DIR, CITY
+from overpass_loader import load_overpass_edges
+
+
+def test_load_cached_response(city_edges):
+    with open(os.path.join(CACHE_DIR, CITY)) as f:
+        elements = json.load(f)["elements"]
+    nodes = {e["id"] for e in elements if e["type"] == "node"}
+    ways = {e["id"] for e in elements if e["type"] == "way"}
+
+    assert city_edges.crs.is_projected
+    assert city_edges.crs.utm_zone is not None
+    assert city_edges.index.names == ["u", "v", "key"]
+    assert city_edges.index.is_unique
+    assert set(city_edges.osmid) <= ways
+    u = city_edges.index.get_level_values("u")
+    v = city_edges.index.get_level_values("v")
+    assert set(u) | set(v) <= nodes
+    geoms = city_edges.geometry.values.data
+    assert (pygeos.get_type_id(geoms) == 1).all()
+    assert (pygeos.get_num_coordinates(geoms) >= 2).all()
+    np.testing.assert_allclose(city_edges["length"], pygeos.length(geoms))
+
+
+def test_load_with_crs():
+    edges = load_overpass_edges(os.path.join(CACHE_DIR, CITY), crs="EPSG:3857")
+
+    assert edges.crs == "EPSG:3857"
+
+
+@pytest.mark.parametrize(
+    "elements",
+    [
+        [],
+        [{"type": "node", "id": 1, "lat": 50.0, "lon": 14.0}],
+        [{"type": "way", "id": 10, "nodes": [1, 2]}],
+    ],
+)
+def test_load_without_ways(tmp_path, elements):
+    path = tmp_path / "empty.json"
+    path.write_text(json.dumps({"elements": elements}))
+
+    with pytest.raises(ValueError, match="no way"):
+        load_overpass_edges(str(path))
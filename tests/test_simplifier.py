@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import assert_same_edges
+from rabs_simplify import RoundaboutSimplifier, roundabout_simplification
+
+STAGES = ["roundabouts", "centers", "_pairs", "incoming", "output"]
+
+
+def _stages(simplifier):
+    """Objects of every stage, computed if needed."""
+    return {name: getattr(simplifier, name) for name in STAGES}
+
+
+@pytest.mark.parametrize(
+    "params, first_changed",
+    [
+        ({"angle_threshold": 30}, "incoming"),
+        ({"center_type": "mean"}, "centers"),
+        ({"circom_threshold": 0.8}, "roundabouts"),
+        ({"area_threshold": 0.5}, "roundabouts"),
+    ],
+)
+def test_changed_parameter_recomputes_later_stages(edges, params, first_changed):
+    simplifier = RoundaboutSimplifier(edges)
+    assert_same_edges(simplifier.output, roundabout_simplification(edges))
+    before = _stages(simplifier)
+
+    simplifier.set_params(**params)
+    after = _stages(simplifier)
+
+    changed = STAGES.index(first_changed)
+    for name in STAGES[:changed]:
+        assert after[name] is before[name], name
+    for name in STAGES[changed:]:
+        assert after[name] is not before[name], name
+    assert_same_edges(simplifier.output, roundabout_simplification(edges, **params))
+
+
+def test_same_value_keeps_stages(edges):
+    simplifier = RoundaboutSimplifier(edges)
+    before = _stages(simplifier)
+
+    simplifier.set_params(circom_threshold=0.7, center_type="centroid")
+
+    assert all(getattr(simplifier, name) is before[name] for name in STAGES)
+
+
+def test_unknown_parameter(edges):
+    with pytest.raises(ValueError, match="tile_size"):
+        RoundaboutSimplifier(edges).set_params(tile_size=100)
@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import assert_same_edges
+from rabs_simplify import roundabout_simplification
+from sweep import roundabout_simplification_sweep
+
+GRID = {
+    "circom_threshold": [0.6, 0.8],
+    "area_threshold": [0.5, 0.85],
+    "include_adjacent": [True, False],
+    "center_type": ["centroid", "mean"],
+}
+
+
+def test_sweep_matches_roundabout_simplification(edges):
+    results = roundabout_simplification_sweep(edges, GRID, summary=False)
+
+    assert len(results) == 16
+    for params, result in results:
+        assert_same_edges(result, roundabout_simplification(edges, **params))
+
+
+def test_sweep_summary(edges):
+    summary = roundabout_simplification_sweep(edges, GRID)
+
+    assert len(summary) == 16
+    # a stricter compactness keeps fewer roundabouts
+    by_circom = summary.groupby(
+        ["area_threshold", "include_adjacent", "center_type"]
+    )["roundabouts"]
+    assert (by_circom.first() >= by_circom.last()).all()
+
+
+def test_sweep_rejects_unknown_parameters(edges):
+    with pytest.raises(ValueError, match="tile_size"):
+        roundabout_simplification_sweep(edges, [{"tile_size": 100}])
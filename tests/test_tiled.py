@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pygeos
+import pytest
+
+from conftest import assert_same_edges
+from rabs_simplify import (
+    SpatialIndexContext,
+    _ext_lines_to_center,
+    _global_area_threshold,
+    roundabout_simplification,
+)
+
+
+def _halo_needed(edges):
+    """
+    Largest block diameter and twice the largest roundabout candidate diameter of
+    the whole network, measured as in the first tiled pass.
+    """
+    sindex = SpatialIndexContext(edges)
+    bounds = pygeos.bounds(sindex.polys.geometry.values.data)
+    diameter = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    metrics = sindex.metrics
+    stats = [(metrics.area.to_numpy(), metrics.circom.to_numpy(), diameter)]
+    _, max_diameter, max_block = _global_area_threshold(stats, 0.85, 0.7)
+    return max_block, 2 * max_diameter
+
+
+def test_tiled_matches_single_process(edges):
+    expected = roundabout_simplification(edges)
+    minx, miny, maxx, maxy = edges.total_bounds
+    tile_size = max(maxx - minx, maxy - miny) / 3
+
+    result = roundabout_simplification(
+        edges, tile_size=tile_size, tile_halo=tile_size, n_jobs=1
+    )
+
+    assert len(result) < len(edges)
+    assert_same_edges(result, expected)
+
+
+def test_tiled_processes_default_halo(edges):
+    expected = roundabout_simplification(edges)
+    # the default halo is a quarter of the tile, wide enough for every block and
+    # roundabout here
+    tile_size = 4 * max(_halo_needed(edges))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", UserWarning)
+        result = roundabout_simplification(edges, tile_size=tile_size, n_jobs=2)
+
+    assert_same_edges(result, expected)
+
+
+def test_tiled_processes_warn_on_narrow_default_halo(edges):
+    max_block, _ = _halo_needed(edges)
+
+    # a default halo of an eighth of the largest block
+    with pytest.warns(UserWarning, match="tile_halo .* largest block"):
+        result = roundabout_simplification(edges, tile_size=max_block / 2, n_jobs=2)
+
+    assert len(result) < len(edges)
+
+
+def test_ext_lines_rejects_dropped_incoming(edges):
+    incoming = edges.iloc[:1].assign(line=edges.geometry.iloc[:1])
+
+    with pytest.raises(ValueError, match="dropped"):
+        _ext_lines_to_center(edges, incoming, edges.index[:1])
+    with pytest.raises(ValueError, match="dropped"):
+        _ext_lines_to_center(edges.iloc[1:], incoming, edges.index[:0])
+
+
+def test_global_area_threshold_without_polygons():
+    empty = (np.empty(0), np.empty(0), np.empty(0))
+
+    for stats in ([], [empty, empty]):
+        area_threshold_val, max_diameter, max_block = _global_area_threshold(
+            stats, 0.85, 0.7
+        )
+        assert np.isnan(area_threshold_val)
+        assert max_diameter == max_block == 0
@@ -0,0 +1,20 @@
+"""
+Helpers shared by the modules writing simplified edges to files.
+"""
+
+
+def stringify_lists(gdf):
+    """
+    Converts the values of list-typed columns (e.g. OSM tags merged by OSMnx) to
+    strings, which GeoPackage cannot store. Only the list values are converted,
+    missing values are kept. ``gdf`` is modified in place and returned.
+    """
+    for col in gdf.columns[(gdf.dtypes == object).to_numpy()]:
+        if col == gdf.geometry.name:
+            continue
+        is_list = gdf[col].map(type).isin([list, tuple, set]).to_numpy()
+        if is_list.any():
+            gdf[col] = gdf[col].astype(object)
+            gdf.loc[is_list, col] = gdf.loc[is_list, col].astype(str)
+
+    return gdf